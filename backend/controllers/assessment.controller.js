@@ -2,6 +2,7 @@ const Assessment = require('../models/assessment.model');
 const asyncHandler = require('express-async-handler');
 const fs = require('fs');
 const path = require('path');
+const { spawn } = require('child_process');
 const tf = require('@tensorflow/tfjs');
 const sharp = require('sharp');
 const { OpenAI } = require('@langchain/openai');
@@ -13,6 +14,30 @@ const { OpenAI } = require('@langchain/openai');
 // const { FaissStore } = require('langchain/vectorstores/faiss');
 const MultivariateLinearRegression = require('ml-regression-multivariate-linear');
 
+// Queue the assessment's coordinates for the background runoff worker
+// (scripts/assessment_worker.py), so the runoff and report endpoints find
+// the result already computed. Failures only mean it is computed on demand.
+const enqueueRunoffAssessment = (assessment) => {
+  const scriptPath = path.join(__dirname, '../scripts/assessment_queue.py');
+  const pythonProcess = spawn('python', [
+    scriptPath,
+    'enqueue',
+    assessment.coordinates.latitude.toString(),
+    assessment.coordinates.longitude.toString(),
+    '--assessment-id',
+    assessment._id.toString()
+  ]);
+
+  pythonProcess.on('error', (error) => {
+    console.error('Failed to queue runoff assessment:', error.message);
+  });
+  pythonProcess.on('close', (code) => {
+    if (code !== 0) {
+      console.error(`Runoff assessment queue exited with code ${code}`);
+    }
+  });
+};
+
 // Basic CRUD operations
 
 // @desc    Create a new assessment
@@ -81,6 +106,9 @@ const createAssessment = asyncHandler(async (req, res) => {
   const assessment = await Assessment.create(assessmentData);
 
   if (assessment) {
+    if (assessment.coordinates && assessment.coordinates.latitude != null && assessment.coordinates.longitude != null) {
+      enqueueRunoffAssessment(assessment);
+    }
     res.status(201).json(assessment);
   } else {
     res.status(400);
@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 import sys
 import json
-import random
+import os
 import math
 
+# Shared stateless soil generator lives with the other model scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from soil_generator import coordinate_uniform
+
 def main():
     """
     Process input data and generate runoff coefficient analysis
@@ -55,13 +59,13 @@ def generate_soil_properties(latitude, longitude):
     """
     Generate soil properties based on coordinates
     """
-    # Use coordinates as seed for reproducible randomness
-    seed = abs(float(latitude) * 100) + abs(float(longitude) * 100)
-    random.seed(seed)
+    # Reproducible values keyed on the coordinates (no global RNG state)
+    def uniform(stream, low, high):
+        return low + (high - low) * coordinate_uniform(latitude, longitude, stream)
     
     # Generate soil composition
-    clay = min(max(random.uniform(20, 40), 5), 60)
-    silt = min(max(random.uniform(30, 50), 5), 70)
+    clay = min(max(uniform(0, 20, 40), 5), 60)
+    silt = min(max(uniform(1, 30, 50), 5), 70)
     sand = 100 - clay - silt
     if sand < 5:
         sand = 5
@@ -78,8 +82,8 @@ def generate_soil_properties(latitude, longitude):
     texture = determine_soil_texture(clay, silt, sand)
     
     # Generate other properties
-    organic_carbon = round(min(max(random.uniform(1.0, 2.0), 0.2), 3.0), 2)
-    ksat = round(random.uniform(5, 20), 3)
+    organic_carbon = round(min(max(uniform(2, 1.0, 2.0), 0.2), 3.0), 2)
+    ksat = round(uniform(3, 5, 20), 3)
     
     return {
         "clay": clay,
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import json
+import os
+import time
+import sqlite3
+import pathlib
+import argparse
+
+# Local durable queue of assessment coordinates and the precomputed results
+script_dir = os.path.dirname(os.path.abspath(__file__))
+queue_path = os.path.join(script_dir, 'assessment_queue.db')
+
+# The entry point scripts look precomputed results up in the queue database
+# unless this variable names another file; set to an empty string it turns
+# their lookup off (load_test.py does so to measure the scripts themselves)
+RESULTS_DB_ENV = "RUNOFF_RESULTS_DB"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    assessment_id TEXT,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at);
+CREATE TABLE IF NOT EXISTS results (
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    model_version INTEGER,
+    soil_source TEXT,
+    result TEXT NOT NULL,
+    report TEXT NOT NULL,
+    computed_at REAL NOT NULL,
+    PRIMARY KEY (latitude, longitude)
+);
+"""
+
+# Job states: queued -> running -> done, or back to queued with a backoff
+# after a failure, or dead once max_attempts have failed
+STATUSES = ["queued", "running", "done", "dead"]
+
+def result_key(latitude, longitude):
+    """
+    Results are stored and looked up at the exact coordinate they were
+    computed for, so a stored answer is the one predict_runoff_coefficient
+    gives for that point
+    """
+    return float(latitude), float(longitude)
+
+def percentile(values, q):
+    """
+    Nearest-rank percentile of a sorted list
+    """
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(q / 100.0 * len(values)))]
+
+class AssessmentQueue:
+    """
+    SQLite-backed job queue for assessment coordinates.
+
+    Jobs are claimed in batches inside an immediate transaction, so several
+    workers can share one database file. A claimed job that is neither
+    completed nor failed within `lease_seconds` (a crashed worker) becomes
+    claimable again. Each call opens its own connection, so the queue can
+    be used from any thread.
+    """
+    def __init__(self, path=queue_path, max_attempts=5, retry_delay=30.0, lease_seconds=300.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        # Base delay before a failed job is retried; doubled on every attempt
+        self.retry_delay = retry_delay
+        self.lease_seconds = lease_seconds
+        with self.connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # Databases created before results recorded their soil source;
+            # their rows keep a NULL source and are never served
+            columns = [row["name"] for row in conn.execute("PRAGMA table_info(results)")]
+            if "soil_source" not in columns:
+                conn.execute("ALTER TABLE results ADD COLUMN soil_source TEXT")
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return _Connection(conn)
+
+    def enqueue(self, points, assessment_ids=None):
+        """
+        Queue (latitude, longitude) points; returns the new job ids
+        """
+        now = time.time()
+        assessment_ids = assessment_ids or [None] * len(points)
+        ids = []
+        with self.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for (latitude, longitude), assessment_id in zip(points, assessment_ids):
+                cursor = conn.execute(
+                    "INSERT INTO jobs (assessment_id, latitude, longitude, enqueued_at, available_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (assessment_id, float(latitude), float(longitude), now, now)
+                )
+                ids.append(cursor.lastrowid)
+            conn.execute("COMMIT")
+        return ids
+
+    def claim(self, batch_size):
+        """
+        Mark up to batch_size ready jobs as running and return them.
+        A job whose lease expired after its last allowed attempt (it crashed
+        or hung the worker every time) is dead-lettered instead of reclaimed.
+        """
+        now = time.time()
+        with self.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET status = 'dead', finished_at = ?, "
+                "last_error = 'Lease expired after ' || attempts || ' attempts' "
+                "WHERE status = 'running' AND started_at < ? AND attempts >= ?",
+                (now, now - self.lease_seconds, self.max_attempts)
+            )
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE (status = 'queued' AND available_at <= ?) "
+                "OR (status = 'running' AND started_at < ?) ORDER BY available_at, id LIMIT ?",
+                (now, now - self.lease_seconds, batch_size)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ? WHERE id = ?",
+                [(now, row["id"]) for row in rows]
+            )
+            conn.execute("COMMIT")
+        return [dict(row, attempts=row["attempts"] + 1) for row in rows]
+
+    def complete(self, jobs, results, reports, model_version=None, soil_source="synthetic"):
+        """
+        Store the results of finished jobs and mark them done, atomically.
+        `soil_source` records where the soil properties came from, so a
+        lookup only serves them to callers that use the same source.
+        """
+        now = time.time()
+        with self.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR REPLACE INTO results "
+                "(latitude, longitude, model_version, soil_source, result, report, computed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    result_key(job["latitude"], job["longitude"])
+                    + (model_version, soil_source, json.dumps(result), report, now)
+                    for job, result, report in zip(jobs, results, reports)
+                ]
+            )
+            conn.executemany(
+                "UPDATE jobs SET status = 'done', finished_at = ?, last_error = NULL WHERE id = ?",
+                [(now, job["id"]) for job in jobs]
+            )
+            conn.execute("COMMIT")
+
+    def fail(self, jobs, error):
+        """
+        Put failed jobs back with exponential backoff, or move them to the
+        dead letters once they have used up max_attempts
+        """
+        now = time.time()
+        with self.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for job in jobs:
+                if job["attempts"] >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'dead', finished_at = ?, last_error = ? WHERE id = ?",
+                        (now, str(error), job["id"])
+                    )
+                else:
+                    delay = self.retry_delay * 2 ** (job["attempts"] - 1)
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', available_at = ?, last_error = ? WHERE id = ?",
+                        (now + delay, str(error), job["id"])
+                    )
+            conn.execute("COMMIT")
+
+    def requeue_dead(self):
+        """
+        Give dead-lettered jobs a fresh set of attempts; returns how many
+        """
+        now = time.time()
+        with self.connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, available_at = ?, finished_at = NULL "
+                "WHERE status = 'dead'",
+                (now,)
+            )
+            return cursor.rowcount
+
+    def dead_letters(self, limit=100):
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT id, assessment_id, latitude, longitude, attempts, last_error FROM jobs "
+                "WHERE status = 'dead' ORDER BY finished_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def lookup(self, latitude, longitude, model_version=None, soil_source="synthetic"):
+        return lookup_result(latitude, longitude, model_version, self.path, soil_source)
+
+    def metrics(self, window_seconds=3600.0):
+        """
+        Queue depth per status, age of the oldest waiting job and latency
+        percentiles (enqueue to done) of the jobs finished within the window
+        """
+        now = time.time()
+        with self.connect() as conn:
+            depth = dict.fromkeys(STATUSES, 0)
+            for row in conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"):
+                depth[row["status"]] = row["n"]
+            oldest = conn.execute("SELECT MIN(enqueued_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            latencies = [row[0] for row in conn.execute(
+                "SELECT finished_at - enqueued_at FROM jobs WHERE status = 'done' AND finished_at >= ? "
+                "ORDER BY 1",
+                (now - window_seconds,)
+            )]
+            retried = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'done' AND attempts > 1 AND finished_at >= ?",
+                (now - window_seconds,)
+            ).fetchone()[0]
+            stored = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+        def seconds(value):
+            return None if value is None else round(value, 3)
+
+        return {
+            "depth": depth,
+            "oldest_queued_seconds": seconds(now - oldest if oldest is not None else None),
+            "completed_in_window": len(latencies),
+            "retried_in_window": retried,
+            "latency_seconds": {
+                "p50": seconds(percentile(latencies, 50)),
+                "p95": seconds(percentile(latencies, 95)),
+                "p99": seconds(percentile(latencies, 99)),
+                "max": seconds(latencies[-1] if latencies else None)
+            },
+            "stored_results": stored
+        }
+
+class _Connection:
+    """
+    Context manager that closes the connection (sqlite3's own only commits)
+    and rolls back a transaction left open by an exception
+    """
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.conn.in_transaction:
+            self.conn.rollback()
+        self.conn.close()
+
+def lookup_result(latitude, longitude, model_version=None, path=None, soil_source="synthetic"):
+    """
+    The stored (result, report) for a coordinate, or None when it has not
+    been computed yet or was computed by a different model version or from
+    a different soil source than the caller's.
+    Without a path the database named by RUNOFF_RESULTS_DB (default: the
+    queue database) is used, and none at all when that is empty.
+    Uses a read-only connection, so it never creates or migrates the database.
+    """
+    if path is None:
+        path = os.environ.get(RESULTS_DB_ENV, queue_path)
+        if not path:
+            return None
+    try:
+        conn = sqlite3.connect(pathlib.Path(path).absolute().as_uri() + "?mode=ro", uri=True, timeout=5.0)
+    except sqlite3.Error:
+        return None
+    try:
+        row = conn.execute(
+            "SELECT model_version, soil_source, result, report FROM results WHERE latitude = ? AND longitude = ?",
+            result_key(latitude, longitude)
+        ).fetchone()
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+    if row is None or row[0] != model_version or row[1] != soil_source:
+        return None
+    return json.loads(row[2]), row[3]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assessment queue: enqueue coordinates and inspect the queue")
+    parser.add_argument("--db", default=queue_path, help="Queue database file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = subparsers.add_parser("enqueue", help="Queue one coordinate")
+    enqueue_parser.add_argument("latitude", type=float)
+    enqueue_parser.add_argument("longitude", type=float)
+    enqueue_parser.add_argument("--assessment-id", default=None)
+
+    metrics_parser = subparsers.add_parser("metrics", help="Queue depth and latency")
+    metrics_parser.add_argument("--window", type=float, default=3600.0, help="Latency window in seconds")
+
+    subparsers.add_parser("dead", help="List dead-lettered jobs")
+    subparsers.add_parser("requeue-dead", help="Retry dead-lettered jobs")
+    args = parser.parse_args()
+
+    try:
+        queue = AssessmentQueue(args.db)
+        if args.command == "enqueue":
+            ids = queue.enqueue([(args.latitude, args.longitude)], [args.assessment_id])
+            print(json.dumps({"job_id": ids[0]}))
+        elif args.command == "metrics":
+            print(json.dumps(queue.metrics(args.window)))
+        elif args.command == "dead":
+            print(json.dumps(queue.dead_letters()))
+        else:
+            print(json.dumps({"requeued": queue.requeue_dead()}))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from runoff_coefficient import (
+    classify_soil_texture, features_from_soil, predict_ksat_batch, prediction_record
+)
+from assessment_queue import AssessmentQueue, queue_path, result_key
+from model_store import ModelStore
+from report_rendering import render_json
+from soil_generator import synthetic_soil
+from soilgrids import SOILGRIDS_URL, fetch_soil_properties
+
+class AssessmentWorker:
+    """
+    Background worker for queued assessments.
+
+    Claims a batch of jobs, prefetches the soil properties of the distinct
+    coordinates concurrently, predicts them all in one booster call, renders
+    the reports and stores results and reports in the queue database, where
+    the interactive entry points look them up.
+
+    A coordinate whose soil fetch fails only fails its own jobs; a failed
+    prediction fails the whole batch. Failed jobs are retried with backoff
+    and dead-lettered by the queue after max_attempts.
+    """
+    def __init__(self, queue, store, soil_source="synthetic", soilgrids_url=SOILGRIDS_URL,
+                 batch_size=256, fetch_threads=8):
+        self.queue = queue
+        self.store = store
+        self.soil_source = soil_source
+        self.soilgrids_url = soilgrids_url
+        self.batch_size = batch_size
+        self.fetch_threads = fetch_threads
+        self.processed = 0
+        self.failed = 0
+        self.batches = 0
+
+    def prefetch_soil(self, keys):
+        """
+        Soil properties (clay, silt, sand, oc) for each coordinate key, or
+        the exception its fetch raised
+        """
+        if self.soil_source != "soilgrids":
+            lats, lons = zip(*keys)
+            clay, silt, sand, oc = synthetic_soil(lats, lons)
+            return dict(zip(keys, zip(clay.tolist(), silt.tolist(), sand.tolist(), oc.tolist())))
+
+        def fetch(key):
+            try:
+                return fetch_soil_properties(key[0], key[1], self.soilgrids_url)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.fetch_threads) as pool:
+            return dict(zip(keys, pool.map(fetch, keys)))
+
+    def process(self, jobs):
+        """
+        Compute and store the results of one claimed batch
+        """
+        snapshot = self.store.current
+        by_key = {}
+        for job in jobs:
+            by_key.setdefault(result_key(job["latitude"], job["longitude"]), []).append(job)
+
+        soil = self.prefetch_soil(list(by_key))
+        for key, value in soil.items():
+            if isinstance(value, Exception):
+                self.queue.fail(by_key[key], value)
+                self.failed += len(by_key[key])
+        keys = [key for key, value in soil.items() if not isinstance(value, Exception)]
+        if not keys:
+            return
+
+        done = [job for key in keys for job in by_key[key]]
+        try:
+            features = features_from_soil(*zip(*[soil[key] for key in keys]))
+            ksat = np.asarray(predict_ksat_batch(snapshot.model, features), dtype=np.float64)
+            results, reports = [], []
+            for key, value in zip(keys, ksat.tolist()):
+                clay, silt, sand, _ = soil[key]
+                result = prediction_record(soil[key], classify_soil_texture(sand, silt, clay)[0], value)
+                report = render_json(result, key[0], key[1])
+                for _ in by_key[key]:
+                    results.append(result)
+                    reports.append(report)
+        except Exception as e:
+            self.queue.fail(done, e)
+            self.failed += len(done)
+            return
+
+        self.queue.complete(done, results, reports, snapshot.version, self.soil_source)
+        self.processed += len(done)
+
+    def run_once(self):
+        """
+        Claim and process one batch; returns the number of jobs claimed
+        """
+        jobs = self.queue.claim(self.batch_size)
+        if jobs:
+            self.process(jobs)
+            self.batches += 1
+        return len(jobs)
+
+    def run(self, idle_interval=1.0, drain=False):
+        """
+        Keep processing batches, sleeping while the queue is empty.
+        With drain=True return once no job is ready.
+        """
+        while True:
+            if not self.run_once():
+                if drain:
+                    return
+                time.sleep(idle_interval)
+
+    def stats(self):
+        return {"batches": self.batches, "processed": self.processed, "failed": self.failed}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Background worker for queued runoff assessments")
+    parser.add_argument("--db", default=queue_path, help="Queue database file")
+    parser.add_argument("--batch-size", type=int, default=256, help="Jobs claimed per batch")
+    parser.add_argument("--soil-source", choices=["synthetic", "soilgrids"], default="synthetic")
+    parser.add_argument("--soilgrids-url", default=SOILGRIDS_URL)
+    parser.add_argument("--fetch-threads", type=int, default=8, help="Concurrent SoilGrids fetches")
+    parser.add_argument("--max-attempts", type=int, default=5, help="Attempts before a job is dead-lettered")
+    parser.add_argument("--retry-delay", type=float, default=30.0,
+                        help="Seconds before the first retry; doubled on every further attempt")
+    parser.add_argument("--idle-interval", type=float, default=1.0, help="Seconds between polls of an empty queue")
+    parser.add_argument("--poll-interval", type=float, default=2.0,
+                        help="Seconds between checks of the model artifact")
+    parser.add_argument("--drain", action="store_true", help="Exit once the queue has no ready jobs")
+    args = parser.parse_args()
+
+    try:
+        store = ModelStore(poll_interval=args.poll_interval).start()
+    except FileNotFoundError:
+        print(json.dumps({"error": "Model file not found"}))
+        sys.exit(1)
+    except Exception as e:
+        print(json.dumps({"error": f"Failed to load model: {str(e)}"}))
+        sys.exit(1)
+
+    queue = AssessmentQueue(args.db, max_attempts=args.max_attempts, retry_delay=args.retry_delay)
+    worker = AssessmentWorker(queue, store, args.soil_source, args.soilgrids_url,
+                              args.batch_size, args.fetch_threads)
+    try:
+        worker.run(args.idle_interval, args.drain)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.stop()
+        print(json.dumps({"worker": worker.stats(), "queue": queue.metrics()}))
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import json
+import os
+import time
+import argparse
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+from runoff_coefficient import (
+    FEATURE_COLUMNS, load_model, model_path, predict_ksat_batch,
+    runoff_coefficient_from_ksat, soil_feature_matrix
+)
+
+# Rows scored per predict call inside a worker, to bound temporary memory
+WORKER_CHUNK_ROWS = 65536
+
+def _score_range(features_name, output_name, n_rows, start, stop, path, timings=None, slot=0):
+    """
+    Worker entry point: attach to the shared arrays, load the model once
+    and write predictions for rows [start, stop) straight into the output.
+    `timings` optionally receives the monotonic times the worker started
+    scoring and finished, at [2 * slot] and [2 * slot + 1].
+    """
+    features_shm = shared_memory.SharedMemory(name=features_name)
+    output_shm = shared_memory.SharedMemory(name=output_name)
+    try:
+        features = np.ndarray((n_rows, len(FEATURE_COLUMNS)), dtype=np.float32, buffer=features_shm.buf)
+        output = np.ndarray((n_rows,), dtype=np.float32, buffer=output_shm.buf)
+
+        model = load_model(path)
+        # One thread per process; parallelism comes from the processes
+        if hasattr(model, "get_booster"):
+            model.get_booster().set_param({"nthread": 1})
+
+        if timings is not None:
+            timings[2 * slot] = time.monotonic()
+        for chunk_start in range(start, stop, WORKER_CHUNK_ROWS):
+            chunk_stop = min(chunk_start + WORKER_CHUNK_ROWS, stop)
+            output[chunk_start:chunk_stop] = predict_ksat_batch(model, features[chunk_start:chunk_stop])
+        if timings is not None:
+            timings[2 * slot + 1] = time.monotonic()
+        del features, output
+    finally:
+        features_shm.close()
+        output_shm.close()
+
+def score_features(features, n_workers=None, path=model_path, stats=None):
+    """
+    Score a feature matrix across worker processes.
+
+    The features are copied once into shared memory; each worker maps the
+    same block, scores its own contiguous row range in place and writes
+    Ksat into a shared output array, so nothing is pickled per row.
+
+    If a `stats` dict is given it receives the time split into setup
+    (shared-memory copy, process start-up and model loading, up to the
+    last worker starting to score), scoring (the slowest worker's
+    scoring time) and the end-to-end total.
+    """
+    started = time.monotonic()
+    features = np.ascontiguousarray(features, dtype=np.float32)
+    n_rows = len(features)
+    n_workers = max(1, min(n_workers or os.cpu_count() or 1, n_rows or 1))
+
+    features_shm = shared_memory.SharedMemory(create=True, size=max(features.nbytes, 1))
+    output_shm = shared_memory.SharedMemory(create=True, size=max(n_rows * 4, 1))
+    try:
+        shared_features = np.ndarray(features.shape, dtype=np.float32, buffer=features_shm.buf)
+        shared_features[:] = features
+        output = np.ndarray((n_rows,), dtype=np.float32, buffer=output_shm.buf)
+
+        bounds = np.linspace(0, n_rows, n_workers + 1).astype(int)
+        timings = mp.Array('d', 2 * n_workers, lock=False) if stats is not None else None
+        workers = [
+            mp.Process(
+                target=_score_range,
+                args=(features_shm.name, output_shm.name, n_rows, bounds[i], bounds[i + 1], path, timings, i)
+            )
+            for i in range(n_workers)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        failed = [worker.exitcode for worker in workers if worker.exitcode != 0]
+        if failed:
+            raise RuntimeError(f"{len(failed)} scoring worker(s) failed with exit codes {failed}")
+
+        ksat = output.copy()
+        del shared_features, output
+        if stats is not None:
+            starts, ends = timings[0::2], timings[1::2]
+            stats["setup_seconds"] = max(starts) - started
+            stats["scoring_seconds"] = max(end - start for start, end in zip(starts, ends))
+            stats["total_seconds"] = time.monotonic() - started
+        return ksat
+    finally:
+        features_shm.close()
+        features_shm.unlink()
+        output_shm.close()
+        output_shm.unlink()
+
+def load_input(path):
+    """
+    Load rows to score: either latitude/longitude columns, which are turned
+    into soil features, or the model feature columns themselves
+    """
+    if path.endswith('.npy'):
+        return pd.DataFrame(np.load(path), columns=FEATURE_COLUMNS)
+    return pd.read_csv(path)
+
+def feature_matrix(frame):
+    """
+    Extract the float32 feature matrix from an input frame
+    """
+    if all(column in frame.columns for column in FEATURE_COLUMNS):
+        return frame[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    if "latitude" in frame.columns and "longitude" in frame.columns:
+        return soil_feature_matrix(frame["latitude"].to_numpy(), frame["longitude"].to_numpy())
+    raise ValueError("Input needs latitude/longitude columns or the model feature columns")
+
+def run_benchmark(n_rows, max_workers, path=model_path):
+    """
+    Measure throughput for 1, 2, 4, ... workers on a synthetic feature matrix.
+
+    Every run starts fresh processes that load the model, so start-up is
+    reported separately; speedup and efficiency are computed on scoring
+    time alone, with the end-to-end speedup next to them.
+    """
+    rng = np.random.default_rng(0)
+    features = np.empty((n_rows, len(FEATURE_COLUMNS)), dtype=np.float32)
+    features[:, 0] = rng.uniform(5, 60, n_rows)
+    features[:, 1] = rng.uniform(5, 70, n_rows)
+    features[:, 2] = np.clip(100 - features[:, 0] - features[:, 1], 5, None)
+    features[:, 3] = rng.integers(0, 12, n_rows)
+    features[:, 4] = rng.uniform(0.2, 3.0, n_rows)
+
+    counts = []
+    n = 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+
+    results = []
+    baseline = None
+    for n_workers in counts:
+        stats = {}
+        score_features(features, n_workers, path, stats)
+        baseline = baseline or stats
+        scoring_speedup = baseline["scoring_seconds"] / stats["scoring_seconds"]
+        results.append({
+            "workers": n_workers,
+            "setup_seconds": round(stats["setup_seconds"], 3),
+            "scoring_seconds": round(stats["scoring_seconds"], 3),
+            "total_seconds": round(stats["total_seconds"], 3),
+            "scoring_rows_per_second": round(n_rows / stats["scoring_seconds"]),
+            "speedup": round(scoring_speedup, 2),
+            "efficiency": round(scoring_speedup / n_workers, 2),
+            "total_speedup": round(baseline["total_seconds"] / stats["total_seconds"], 2)
+        })
+    return {"rows": n_rows, "cpus": os.cpu_count(), "runs": results}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-process bulk runoff scoring")
+    parser.add_argument("input", nargs="?", help="CSV with latitude/longitude or feature columns, or .npy features")
+    parser.add_argument("output", nargs="?", help="Output CSV (default: print JSON)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--benchmark", type=int, default=None, metavar="ROWS",
+                        help="Run the scaling benchmark on this many synthetic rows")
+    args = parser.parse_args()
+
+    try:
+        if args.benchmark:
+            print(json.dumps(run_benchmark(args.benchmark, args.workers or os.cpu_count() or 1)))
+            sys.exit(0)
+
+        if not args.input:
+            print(json.dumps({"error": "Expected an input file"}))
+            sys.exit(1)
+
+        frame = load_input(args.input)
+        ksat = score_features(feature_matrix(frame), args.workers).astype(np.float64)
+        frame["ksat"] = np.round(ksat, 3)
+        frame["runoff_coefficient"] = np.round(runoff_coefficient_from_ksat(ksat), 3)
+
+        if args.output:
+            frame.to_csv(args.output, index=False)
+            print(json.dumps({"rows": len(frame), "output": args.output}))
+        else:
+            print(frame.to_json(orient="records"))
+    except FileNotFoundError as e:
+        print(json.dumps({"error": f"File not found: {e.filename}"}))
+        sys.exit(1)
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
@@ -6,6 +6,9 @@ import json
 import os
 import subprocess
 
+from assessment_queue import lookup_result
+from model_metadata import read_version
+
 def get_runoff_data(latitude, longitude):
     """
     Call the runoff_coefficient.py script with the provided coordinates
@@ -103,6 +106,12 @@ if __name__ == "__main__":
         latitude = float(sys.argv[1])
         longitude = float(sys.argv[2])
         
+        # Serve the report the assessment worker already rendered, if any
+        precomputed = lookup_result(latitude, longitude, read_version(), soil_source="synthetic")
+        if precomputed is not None:
+            print(precomputed[1])
+            sys.exit(0)
+        
         # Get runoff coefficient data
         data = get_runoff_data(latitude, longitude)
         
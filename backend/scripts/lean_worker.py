@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import tracemalloc
+
+# Started before the imports below, so the report can attribute module memory
+if "--memory-report" in sys.argv:
+    tracemalloc.start()
+
+# xgboost imports pandas and scikit-learn whenever they are installed, which
+# roughly doubles a worker's footprint. The booster API used here needs
+# neither, so keep them out of this process.
+for _module in ("pandas", "sklearn"):
+    sys.modules.setdefault(_module, None)
+
+import json
+import os
+import time
+import struct
+import argparse
+import numpy as np
+import xgboost as xgb
+
+from runoff_coefficient import (
+    TEXTURE_ENCODING, classify_soil_texture_batch, file_signature, load_versioned_model, model_path,
+    runoff_coefficient_from_ksat
+)
+from soil_generator import coordinate_key, synthetic_soil
+from soilgrids import SOILGRIDS_URL, fetch_soil_properties
+
+TEXTURE_NAMES = {code: name for name, code in TEXTURE_ENCODING.items()}
+
+# Soil properties (float64, so rounding matches predict_runoff_coefficient),
+# Ksat as predicted (float32) and the texture code
+RECORD_LAYOUT = struct.Struct("<4dfb")
+
+# Bookkeeping of one dict slot (hash, key and value pointers, index entry
+# and the table's growth slack), added to the key and value sizes of a
+# cache entry. Chosen so tracemalloc never sees a full cache above its limit.
+DICT_ENTRY_BYTES = 96
+
+class ResultRecord:
+    """
+    One prediction, kept flat until it is serialised
+    """
+    __slots__ = ("latitude", "longitude", "clay", "silt", "sand", "organic_carbon", "ksat", "texture")
+
+    def __init__(self, latitude, longitude, clay, silt, sand, organic_carbon, ksat, texture):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.clay = clay
+        self.silt = silt
+        self.sand = sand
+        self.organic_carbon = organic_carbon
+        self.ksat = ksat
+        self.texture = texture
+
+    def pack(self):
+        return RECORD_LAYOUT.pack(self.clay, self.silt, self.sand, self.organic_carbon, self.ksat, self.texture)
+
+    @classmethod
+    def unpack(cls, latitude, longitude, payload):
+        return cls(latitude, longitude, *RECORD_LAYOUT.unpack(payload))
+
+    def to_dict(self):
+        """
+        The predict_runoff_coefficient result for this record
+        """
+        return {
+            "runoff_coefficient": round(runoff_coefficient_from_ksat(self.ksat), 3),
+            "ksat": round(self.ksat, 3),
+            "soil_properties": {
+                "clay": round(self.clay, 1),
+                "silt": round(self.silt, 1),
+                "sand": round(self.sand, 1),
+                "organic_carbon": round(self.organic_carbon, 2),
+                "texture": TEXTURE_NAMES[self.texture]
+            }
+        }
+
+class ByteBoundedCache:
+    """
+    LRU cache of packed records that never accounts for more than
+    max_bytes. A plain dict keeps insertion order, so re-inserting on a hit
+    makes it an LRU without OrderedDict's per-entry links.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def entry_bytes(key, value):
+        return sys.getsizeof(key) + sys.getsizeof(value) + DICT_ENTRY_BYTES
+
+    def get(self, key):
+        value = self.entries.pop(key, None)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        size = self.entry_bytes(key, value)
+        if size > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.bytes -= self.entry_bytes(key, old)
+        while self.bytes + size > self.max_bytes:
+            evicted_key = next(iter(self.entries))
+            self.bytes -= self.entry_bytes(evicted_key, self.entries.pop(evicted_key))
+            self.evictions += 1
+        self.entries[key] = value
+        self.bytes += size
+
+    def clear(self):
+        self.entries = {}
+        self.bytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+def load_booster(path=model_path):
+    """
+    Load the pickled model and keep only its booster, single-threaded
+    since parallelism comes from running several workers.
+    Returns the booster and the version published with it.
+    """
+    model, version = load_versioned_model(path)
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    if not isinstance(booster, xgb.Booster):
+        raise TypeError(f"Expected an XGBoost model, got {type(model).__name__}")
+    booster.set_param({"nthread": 1})
+    return booster, version
+
+class LeanPredictor:
+    """
+    Minimal resident predictor: the raw booster, one preallocated float32
+    feature buffer reused by every batch and a byte-bounded result cache.
+
+    Between requests the model artifact is stat'ed (at most every
+    poll_interval seconds); when it changed the booster is reloaded and
+    the cache, which only holds the old model's results, is cleared. A
+    failed reload keeps the old booster serving.
+    """
+    def __init__(self, booster, version=None, max_batch=1024, cache_bytes=4 << 20,
+                 soil_source="synthetic", soilgrids_url=SOILGRIDS_URL,
+                 path=model_path, poll_interval=2.0, signature=None):
+        self.booster = booster
+        self.version = version
+        self.max_batch = max_batch
+        self.features = np.empty((max_batch, 5), dtype=np.float32)
+        self.cache = ByteBoundedCache(cache_bytes)
+        self.soil_source = soil_source
+        self.soilgrids_url = soilgrids_url
+        self.path = path
+        self.poll_interval = poll_interval
+        # Signature of the artifact the booster came from, taken before it was loaded
+        self.signature = signature if signature is not None else file_signature(path)
+        self.next_poll = time.monotonic() + poll_interval
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error = None
+        self._rejected_signature = None
+
+    def check_for_update(self):
+        """
+        Reload the booster if the artifact changed since it was loaded.
+        Returns True when a new booster was swapped in.
+        """
+        now = time.monotonic()
+        if now < self.next_poll:
+            return False
+        self.next_poll = now + self.poll_interval
+
+        try:
+            signature = file_signature(self.path)
+        except OSError as e:
+            self.failed_reloads += 1
+            self.last_error = f"Model file unavailable: {e}"
+            return False
+        if signature == self.signature or signature == self._rejected_signature:
+            return False
+
+        try:
+            booster, version = load_booster(self.path)
+        except Exception as e:
+            # Don't retry the same broken artifact on every poll
+            self._rejected_signature = signature
+            self.failed_reloads += 1
+            self.last_error = f"Model reload failed: {e}"
+            return False
+
+        self.booster, self.version, self.signature = booster, version, signature
+        self.cache.clear()
+        self._rejected_signature = None
+        self.last_error = None
+        self.reloads += 1
+        return True
+
+    def soil(self, lats, lons):
+        """
+        (clay, silt, sand, oc) float64 arrays for a batch of coordinates
+        """
+        if self.soil_source == "soilgrids":
+            return tuple(np.array(values, dtype=np.float64) for values in zip(*[
+                fetch_soil_properties(lat, lon, self.soilgrids_url) for lat, lon in zip(lats, lons)
+            ]))
+        return synthetic_soil(lats, lons)
+
+    def _predict_chunk(self, lats, lons):
+        n = len(lats)
+        clay, silt, sand, oc = self.soil(lats, lons)
+        features = self.features[:n]
+        features[:, 0] = clay
+        features[:, 1] = silt
+        features[:, 2] = sand
+        texture = classify_soil_texture_batch(sand, silt, clay)
+        features[:, 3] = texture
+        features[:, 4] = oc
+        ksat = self.booster.inplace_predict(features)
+        return [
+            ResultRecord(lat, lon, *values)
+            for lat, lon, values in zip(lats, lons, zip(
+                clay.tolist(), silt.tolist(), sand.tolist(), oc.tolist(), ksat.tolist(), texture.tolist()
+            ))
+        ]
+
+    def predict(self, lats, lons):
+        """
+        ResultRecords for a batch of coordinates, from the cache where possible
+        """
+        records = [None] * len(lats)
+        missing = []
+        for position, (lat, lon) in enumerate(zip(lats, lons)):
+            payload = self.cache.get(coordinate_key(lat, lon))
+            if payload is None:
+                missing.append(position)
+            else:
+                records[position] = ResultRecord.unpack(lat, lon, payload)
+
+        for start in range(0, len(missing), self.max_batch):
+            chunk = missing[start:start + self.max_batch]
+            computed = self._predict_chunk([lats[i] for i in chunk], [lons[i] for i in chunk])
+            for position, record in zip(chunk, computed):
+                records[position] = record
+                self.cache.put(coordinate_key(record.latitude, record.longitude), record.pack())
+        return records
+
+    def handle_request(self, request):
+        """
+        Same request / response shapes as runoff_server.py for single
+        coordinates and "status"; {"points": [[lat, lon], ...]} predicts a batch
+        """
+        if request.get("command") == "status":
+            return {
+                "model_version": self.version,
+                "reloads": self.reloads,
+                "failed_reloads": self.failed_reloads,
+                "last_error": self.last_error,
+                "cache": self.cache.stats(),
+                "rss_bytes": rss_bytes()
+            }
+
+        points = request.get("points")
+        if points is None:
+            latitude, longitude = request.get("latitude"), request.get("longitude")
+            if latitude is None or longitude is None:
+                return {"error": "Latitude and longitude are required"}
+            record = self.predict([float(latitude)], [float(longitude)])[0]
+            return dict(record.to_dict(), model_version=self.version)
+
+        lats = [float(lat) for lat, _ in points]
+        lons = [float(lon) for _, lon in points]
+        return {
+            "model_version": self.version,
+            "results": [
+                {"latitude": record.latitude, "longitude": record.longitude, **record.to_dict()}
+                for record in self.predict(lats, lons)
+            ]
+        }
+
+def rss_bytes():
+    """
+    Current resident set size (peak RSS where /proc is not available)
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+class MemoryReport:
+    """
+    RSS and tracemalloc-traced Python allocations, attributed to the
+    startup stages in the order they are recorded. Native allocations
+    (the booster's trees) only show up in the RSS column.
+    """
+    def __init__(self):
+        self.stages = []
+        self.last_rss = 0
+        self.last_traced = 0
+
+    def record(self, name):
+        rss = rss_bytes()
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        self.stages.append({
+            "component": name,
+            "rss_bytes": rss - self.last_rss,
+            "python_bytes": traced - self.last_traced
+        })
+        self.last_rss, self.last_traced = rss, traced
+
+    def top_allocations(self, limit=10):
+        """
+        Largest traced allocations grouped by file
+        """
+        if not tracemalloc.is_tracing():
+            return []
+        stats = tracemalloc.take_snapshot().statistics('filename')
+        return [{"file": stat.traceback[0].filename, "bytes": stat.size} for stat in stats[:limit]]
+
+    def summary(self):
+        return {
+            "rss_bytes": self.last_rss,
+            "python_bytes": self.last_traced,
+            "python_peak_bytes": tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None,
+            "components": self.stages,
+            "top_allocations": self.top_allocations()
+        }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory-lean resident runoff predictor (JSON lines on stdin/stdout)")
+    parser.add_argument("--max-batch", type=int, default=1024, help="Rows in the reusable feature buffer")
+    parser.add_argument("--cache-bytes", type=int, default=4 << 20, help="Hard limit of the result cache")
+    parser.add_argument("--soil-source", choices=["synthetic", "soilgrids"], default="synthetic")
+    parser.add_argument("--soilgrids-url", default=SOILGRIDS_URL)
+    parser.add_argument("--poll-interval", type=float, default=2.0,
+                        help="Seconds between checks of the model artifact")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="Warm the worker up with synthetic requests, print its memory use and exit")
+    parser.add_argument("--warmup", type=int, default=100000,
+                        help="Distinct coordinates requested before the memory report")
+    args = parser.parse_args()
+
+    report = MemoryReport()
+    report.record("interpreter_and_modules")
+    try:
+        signature = file_signature(model_path)
+        booster, version = load_booster()
+    except FileNotFoundError:
+        print(json.dumps({"error": "Model file not found"}))
+        sys.exit(1)
+    except Exception as e:
+        print(json.dumps({"error": f"Failed to load model: {str(e)}"}))
+        sys.exit(1)
+    report.record("booster")
+
+    predictor = LeanPredictor(booster, version, args.max_batch, args.cache_bytes,
+                              args.soil_source, args.soilgrids_url,
+                              poll_interval=args.poll_interval, signature=signature)
+    report.record("feature_buffer")
+
+    if args.memory_report:
+        rng = np.random.default_rng(0)
+        started = time.perf_counter()
+        for start in range(0, args.warmup, args.max_batch):
+            n = min(args.max_batch, args.warmup - start)
+            predictor.predict(rng.uniform(8.0, 35.0, n).tolist(), rng.uniform(68.0, 97.0, n).tolist())
+        elapsed = time.perf_counter() - started
+        report.record("result_cache")
+        summary = report.summary()
+        summary["cache"] = predictor.cache.stats()
+        summary["warmup"] = {"requests": args.warmup, "seconds": round(elapsed, 3)}
+        print(json.dumps(summary))
+        sys.exit(0)
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        predictor.check_for_update()
+        try:
+            request = json.loads(line)
+        except ValueError:
+            request, response = None, {"error": "Invalid request"}
+        else:
+            try:
+                response = predictor.handle_request(request)
+            except Exception as e:
+                response = {"error": str(e)}
+        if isinstance(request, dict) and "id" in request:
+            response = {"id": request["id"], **response}
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
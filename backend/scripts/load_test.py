@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import json
+import os
+import time
+import random
+import threading
+import subprocess
+import argparse
+import urllib.parse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+from runoff_coefficient import script_dir
+from assessment_queue import RESULTS_DB_ENV
+from model_store import ModelStore
+from runoff_server import RunoffService
+from site_index import SiteIndex, SiteResolver
+from report_rendering import build_report
+from soil_generator import synthetic_soil
+from soilgrids import DEPTH, PROPERTIES, QUERY_PATH, SOILGRIDS_URL
+
+# Default area for generated coordinates (roughly India)
+DEFAULT_BBOX = (8.0, 68.0, 35.0, 97.0)
+
+def coordinate_sample(distribution, n, bbox=DEFAULT_BBOX, seed=0, clusters=20, spread=0.05, pool=50):
+    """
+    Draw n request coordinates.
+
+    uniform       independent points over the bounding box
+    clustered     points scattered around `clusters` centres (spread in degrees)
+    repeat-heavy  a Zipf-like mix over `pool` distinct points, so the same
+                  few coordinates are asked for over and over
+    """
+    rng = np.random.default_rng(seed)
+    min_lat, min_lon, max_lat, max_lon = bbox
+
+    def uniform(size):
+        return rng.uniform(min_lat, max_lat, size), rng.uniform(min_lon, max_lon, size)
+
+    if distribution == "uniform":
+        lats, lons = uniform(n)
+    elif distribution == "clustered":
+        centre_lats, centre_lons = uniform(clusters)
+        centre = rng.integers(0, clusters, n)
+        lats = np.clip(centre_lats[centre] + rng.normal(0.0, spread, n), min_lat, max_lat)
+        lons = np.clip(centre_lons[centre] + rng.normal(0.0, spread, n), min_lon, max_lon)
+    elif distribution == "repeat-heavy":
+        pool_lats, pool_lons = uniform(pool)
+        weights = 1.0 / np.arange(1, pool + 1)
+        choice = rng.choice(pool, n, p=weights / weights.sum())
+        lats, lons = pool_lats[choice], pool_lons[choice]
+    else:
+        raise ValueError(f"Unknown distribution: {distribution}")
+    return list(zip(np.round(lats, 6).tolist(), np.round(lons, 6).tolist()))
+
+def soilgrids_response(lat, lon):
+    """
+    A SoilGrids query response for a point, in the layout parse_response
+    reads, built from the synthetic soil properties
+    """
+    clay, silt, sand, oc = (float(values[0]) for values in synthetic_soil(lat, lon))
+    # Inverse of convert_to_percent / convert_ocd
+    raw = {"clay": clay * 10.0, "silt": silt * 10.0, "sand": sand * 10.0, "ocd": oc * 1000.0}
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [lon, lat]},
+        "properties": {
+            "layers": [
+                {"name": prop, "depths": [{"label": DEPTH, "values": {"mean": round(raw[prop])}}]}
+                for prop in PROPERTIES
+            ]
+        }
+    }
+
+class SoilGridsStub:
+    """
+    Local stand-in for the SoilGrids query endpoint.
+
+    Serves recorded responses (a JSON-lines file of response bodies, picked
+    per coordinate) or, without recordings, responses built from the
+    synthetic soil. Every request waits `latency` seconds (+/- `jitter`);
+    `error_rate` of them get a 503 and `malformed_rate` a body without
+    layers, so the client's failure paths are exercised too.
+    """
+    def __init__(self, recordings=None, latency=0.05, jitter=0.02, error_rate=0.0,
+                 malformed_rate=0.0, port=0, seed=0):
+        self.recordings = recordings
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return "http://%s:%d" % self.server.server_address
+
+    def response_for(self, lat, lon):
+        if self.recordings:
+            return self.recordings[hash((lat, lon)) % len(self.recordings)]
+        return soilgrids_response(lat, lon)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urllib.parse.urlparse(self.path)
+                with stub.lock:
+                    roll = stub.random.random()
+                    delay = max(0.0, stub.latency + stub.random.uniform(-stub.jitter, stub.jitter))
+                time.sleep(delay)
+
+                if url.path != QUERY_PATH:
+                    outcome, status, body = "not_found", 404, {"detail": "Not Found"}
+                elif roll < stub.error_rate:
+                    outcome, status, body = "error", 503, {"detail": "Service Unavailable"}
+                elif roll < stub.error_rate + stub.malformed_rate:
+                    outcome, status, body = "malformed", 200, {"type": "Feature", "properties": {}}
+                else:
+                    query = urllib.parse.parse_qs(url.query)
+                    lat, lon = float(query["lat"][0]), float(query["lon"][0])
+                    outcome, status, body = "ok", 200, stub.response_for(lat, lon)
+
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                with stub.lock:
+                    stub.counts[outcome] += 1
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts)
+
+def read_recordings(path):
+    """
+    Read recorded SoilGrids response bodies, one JSON document per line
+    """
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def cli_target(entry_point):
+    """
+    Run the entry point script once per request, the way the Node
+    controllers do. Their lookup of precomputed results is turned off, so
+    every request is computed as in service mode without --results-db.
+    """
+    script = os.path.join(script_dir, 'runoff_coefficient.py' if entry_point == "runoff"
+                          else 'generate_runoff_report.py')
+    env = dict(os.environ, **{RESULTS_DB_ENV: ""})
+
+    def call(lat, lon):
+        completed = subprocess.run([sys.executable, script, str(lat), str(lon)],
+                                   capture_output=True, text=True, env=env)
+        if not completed.stdout.strip():
+            return {"error": f"Script exited with code {completed.returncode}"}
+        return json.loads(completed.stdout)
+    return call
+
+def service_target(service, entry_point):
+    """
+    Call a resident RunoffService in-process; reports are rendered from its
+    result as generate_runoff_report.py does
+    """
+    def call(lat, lon):
+        result = service.handle_request({"latitude": lat, "longitude": lon})
+        if entry_point == "report":
+            report = build_report(result, lat, lon)
+            if "source" in result:
+                report["source"] = result["source"]
+            return report
+        return result
+    return call
+
+def error_kind(message):
+    """
+    Collapse an error message into a short category for the breakdown
+    """
+    message = str(message)
+    if "503" in message:
+        return "soilgrids_unavailable"
+    if "Unexpected SoilGrids response" in message or "No SoilGrids data" in message:
+        return "soilgrids_malformed"
+    if "timed out" in message:
+        return "timeout"
+    if "SoilGrids request failed" in message:
+        return "soilgrids_unreachable"
+    return message.split(":")[0][:60]
+
+def percentile_ms(latencies, q):
+    return round(float(np.percentile(latencies, q)) * 1000.0, 2) if len(latencies) else None
+
+def run_load(call, coordinates, rps, concurrency=32):
+    """
+    Issue one request per coordinate at a fixed arrival rate (open loop).
+
+    Latency is measured from each request's scheduled start, so time spent
+    queued behind a saturated service counts against it instead of silently
+    lowering the offered load.
+    """
+    latencies = [None] * len(coordinates)
+    errors = Counter()
+    sources = Counter()
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def issue(position, scheduled, lat, lon):
+        try:
+            result = call(lat, lon)
+            error = result.get("error") if isinstance(result, dict) else None
+        except Exception as e:
+            result, error = None, str(e)
+        latencies[position] = time.perf_counter() - scheduled
+        with lock:
+            if error is not None:
+                errors[error_kind(error)] += 1
+            else:
+                sources[result.get("source", "computed")] += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for position, (lat, lon) in enumerate(coordinates):
+            scheduled = start + position / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(issue, position, scheduled, lat, lon)
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies, dtype=np.float64)
+    n_errors = sum(errors.values())
+    return {
+        "requests": len(coordinates),
+        "target_rps": rps,
+        "achieved_rps": round(len(coordinates) / elapsed, 2),
+        "seconds": round(elapsed, 3),
+        "latency_ms": {
+            "p50": percentile_ms(latencies, 50),
+            "p90": percentile_ms(latencies, 90),
+            "p99": percentile_ms(latencies, 99),
+            "max": round(float(latencies.max()) * 1000.0, 2) if len(latencies) else None
+        },
+        "error_rate": round(n_errors / len(coordinates), 4) if len(coordinates) else 0.0,
+        "errors": dict(errors),
+        "sources": dict(sources)
+    }
+
+def cache_hit_rates(status):
+    """
+    Hit rates from a RunoffService status(): shared in-flight work and
+    reused nearby sites
+    """
+    rates = {}
+    for name, stats in status.get("coalescing", {}).items():
+        rates[f"{name}_coalesced"] = round(stats["suppressed"] / stats["calls"], 4) if stats["calls"] else 0.0
+    if "site_index" in status:
+        rates["site_reuse"] = status["site_index"]["reuse_rate"]
+    return rates
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a coordinate distribution against the runoff entry points")
+    parser.add_argument("--entry-point", choices=["runoff", "report"], default="runoff")
+    parser.add_argument("--mode", choices=["service", "cli"], default="service",
+                        help="Resident RunoffService in-process, or one script process per request")
+    parser.add_argument("--distribution", choices=["uniform", "clustered", "repeat-heavy"], default="uniform")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--rps", type=float, default=50.0, help="Target arrival rate")
+    parser.add_argument("--concurrency", type=int, default=32, help="Maximum requests in flight")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--soil-source", choices=["synthetic", "soilgrids"], default="synthetic",
+                        help="soilgrids fetches from the local stand-in (service mode only; the "
+                             "entry point scripts always use synthetic soil)")
+    # Serving mode options (service mode)
+    parser.add_argument("--no-coalesce", action="store_true")
+    parser.add_argument("--site-index", default=None, help="Reuse nearby sites, starting from this index file")
+    parser.add_argument("--results-db", default=None, help="Answer from results precomputed by the assessment worker")
+    # SoilGrids stand-in
+    parser.add_argument("--recordings", default=None, help="JSON-lines file of recorded SoilGrids responses")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stand-in response time in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of responses without data")
+    args = parser.parse_args()
+
+    service_options = [name for name, value in [
+        ("--soil-source soilgrids", args.soil_source == "soilgrids"), ("--no-coalesce", args.no_coalesce),
+        ("--site-index", args.site_index), ("--results-db", args.results_db)
+    ] if value]
+    if args.mode == "cli" and service_options:
+        # The scripts have no equivalent of these (their results lookup is
+        # turned off, and a hit could not be told apart from a computed
+        # answer), so the run would not be under the load the report claims
+        print(json.dumps({"error": f"Not available in cli mode: {', '.join(service_options)}"}))
+        sys.exit(1)
+
+    stub = None
+    try:
+        coordinates = coordinate_sample(args.distribution, args.requests, seed=args.seed)
+        service = None
+        if args.mode == "cli":
+            call = cli_target(args.entry_point)
+        else:
+            soilgrids_url = SOILGRIDS_URL
+            if args.soil_source == "soilgrids":
+                stub = SoilGridsStub(read_recordings(args.recordings) if args.recordings else None,
+                                     args.latency, args.jitter, args.error_rate, args.malformed_rate,
+                                     seed=args.seed).start()
+                soilgrids_url = stub.url
+            service = RunoffService(ModelStore(), args.soil_source, soilgrids_url, coalesce=not args.no_coalesce)
+            if args.site_index:
+                index = SiteIndex.load(args.site_index) if os.path.exists(args.site_index) else SiteIndex()
+                service.resolver = SiteResolver(index, predict=service.predict)
+            if args.results_db:
+                service.results_db = args.results_db
+            call = service_target(service, args.entry_point)
+
+        report = run_load(call, coordinates, args.rps, args.concurrency)
+        report["configuration"] = {
+            "entry_point": args.entry_point, "mode": args.mode, "distribution": args.distribution,
+            "distinct_coordinates": len(set(coordinates)), "soil_source": args.soil_source,
+            "results_db": bool(args.results_db)
+        }
+        if stub is not None:
+            report["configuration"]["soilgrids_stub"] = {
+                "latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate,
+                "malformed_rate": args.malformed_rate, "recordings": args.recordings
+            }
+        if service is not None:
+            report["configuration"].update(coalesce=not args.no_coalesce, site_index=bool(args.site_index))
+            report["cache_hit_rates"] = cache_hit_rates(service.status())
+        if stub is not None:
+            report["soilgrids_stub"] = stub.stats()
+        print(json.dumps(report))
+    except FileNotFoundError:
+        print(json.dumps({"error": "Model file not found"}))
+        sys.exit(1)
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+    finally:
+        if stub is not None:
+            stub.stop()
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+
+# Model metadata written by retrain_runoff_model.py. Kept free of numpy and
+# pandas so per-request scripts can read the version without importing them.
+script_dir = os.path.dirname(os.path.abspath(__file__))
+metadata_path = os.path.join(script_dir, 'runoff_model_meta.json')
+
+def read_version(path=metadata_path):
+    """
+    Read the model version from the metadata written by retrain_runoff_model.py
+    """
+    try:
+        with open(path, 'r') as f:
+            return json.load(f).get("version")
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import json
+import os
+import time
+import threading
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+from runoff_coefficient import FEATURE_COLUMNS, file_signature, load_versioned_model, model_path, canary_path
+
+# A loaded model together with the artifact it came from.
+# Requests take one snapshot and use it until they finish, so a swap
+# never changes the model under an in-flight request.
+LoadedModel = namedtuple("LoadedModel", ["model", "version", "signature", "loaded_at"])
+
+# Fallback validation batch when no canary file has been published yet
+SMOKE_BATCH = pd.DataFrame(
+    [[30.0, 40.0, 30.0, 1, 1.5], [10.0, 20.0, 70.0, 3, 0.8], [45.0, 35.0, 20.0, 0, 2.2]],
+    columns=FEATURE_COLUMNS
+)
+
+class ModelStore:
+    """
+    Holds the served model and hot-reloads it when the artifact changes.
+
+    A background thread polls the model file. A new version is loaded and
+    validated against the canary batch off the serving path, then swapped
+    in with a single reference assignment. If loading or validation fails
+    the old model keeps serving and the error is recorded in status().
+    """
+    def __init__(self, path=model_path, poll_interval=2.0, max_regression=0.25):
+        self.path = path
+        self.poll_interval = poll_interval
+        # Reject a new model whose canary RMSE is this much worse than the current one
+        self.max_regression = max_regression
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error = None
+        self._current = None
+        self._rejected_signature = None
+        self._stop = threading.Event()
+        self._thread = None
+
+        signature = file_signature(path)
+        model, version = load_versioned_model(path)
+        self._current = LoadedModel(model, version, signature, time.time())
+
+    @property
+    def current(self):
+        """
+        The model snapshot to use for the next request
+        """
+        return self._current
+
+    def start(self):
+        """
+        Start watching the model artifact in a background thread
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the watcher thread
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.check_for_update()
+
+    def check_for_update(self):
+        """
+        Reload the model if the artifact changed since it was last loaded.
+        Returns True when a new model was swapped in.
+        """
+        try:
+            signature = file_signature(self.path)
+        except OSError as e:
+            self._report_failure(f"Model file unavailable: {e}")
+            return False
+
+        if signature == self._current.signature or signature == self._rejected_signature:
+            return False
+
+        try:
+            model, version = load_versioned_model(self.path)
+            self.validate(model)
+        except Exception as e:
+            # Don't retry the same broken artifact on every poll
+            self._rejected_signature = signature
+            self._report_failure(f"Model reload failed: {e}")
+            return False
+
+        self._current = LoadedModel(model, version, signature, time.time())
+        self._rejected_signature = None
+        self.last_error = None
+        self.reloads += 1
+        return True
+
+    def validate(self, model):
+        """
+        Check a candidate model against the canary batch before it serves.
+        Raises ValueError if the predictions are unusable or clearly worse.
+        """
+        if os.path.exists(canary_path):
+            canary = pd.read_csv(canary_path)
+            features = canary[FEATURE_COLUMNS]
+            target = canary["Ksat"].to_numpy() if "Ksat" in canary.columns else None
+        else:
+            features, target = SMOKE_BATCH, None
+
+        predictions = np.asarray(model.predict(features), dtype=np.float64)
+        if predictions.shape != (len(features),):
+            raise ValueError(f"Unexpected prediction shape {predictions.shape}")
+        if not np.all(np.isfinite(predictions)):
+            raise ValueError("Model produced non-finite predictions on the canary batch")
+
+        if target is not None and len(target):
+            rmse = float(np.sqrt(np.mean((predictions - target) ** 2)))
+            current = np.asarray(self._current.model.predict(features), dtype=np.float64)
+            current_rmse = float(np.sqrt(np.mean((current - target) ** 2)))
+            if rmse > current_rmse * (1.0 + self.max_regression):
+                raise ValueError(
+                    f"Canary RMSE {rmse:.3f} is worse than the current model's {current_rmse:.3f}"
+                )
+
+    def _report_failure(self, message):
+        self.failed_reloads += 1
+        self.last_error = message
+        print(json.dumps({"warning": message}), file=sys.stderr, flush=True)
+
+    def status(self):
+        """
+        Reload counters and the currently served version
+        """
+        return {
+            "model_version": self._current.version,
+            "loaded_at": self._current.loaded_at,
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "last_error": self.last_error
+        }
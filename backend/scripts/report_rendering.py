@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import io
+import json
+import math
+import time
+import argparse
+from bisect import bisect_right
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from generate_runoff_report import generate_report, get_runoff_category, get_interpretation
+
+# Upper bounds of the LOW / MODERATE / HIGH bands (VERY HIGH above the last)
+BAND_LIMITS = [0.3, 0.5, 0.7]
+# One representative coefficient per band, used to build the per-band payloads
+BAND_SAMPLES = [0.0, 0.3, 0.5, 0.7]
+
+# Interned (category, interpretation) pair for each band, built once from the
+# same functions generate_report uses so the text never drifts
+BAND_PAYLOADS = tuple(
+    (get_runoff_category(sample), get_interpretation(sample)) for sample in BAND_SAMPLES
+)
+
+KSAT_UNIT = "μm/s"
+
+def band_index(runoff):
+    """
+    Index of the coefficient band (0 = LOW ... 3 = VERY HIGH)
+    """
+    return bisect_right(BAND_LIMITS, runoff)
+
+def _json_number(value):
+    """
+    Format a value the way json.dumps does. Plain finite floats and ints
+    take the fast path; anything else (None, bools, NaN / infinity, other
+    types) is left to json.dumps itself.
+    """
+    value_type = type(value)
+    if value_type is float and math.isfinite(value):
+        return float.__repr__(value)
+    if value_type is int:
+        return int.__repr__(value)
+    return json.dumps(value)
+
+# JSON-encoded texture names, filled on first use (there are only a dozen)
+_texture_json = {}
+
+def _json_texture(texture):
+    encoded = _texture_json.get(texture)
+    if encoded is None:
+        encoded = _texture_json[texture] = json.dumps(texture)
+    return encoded
+
+def _compile_json_template(category, interpretation):
+    """
+    Precompile the generate_report JSON layout for one band, with the
+    constant category / interpretation strings already encoded
+    """
+    return (
+        '{"location": {"latitude": %s, "longitude": %s}, '
+        '"soil_properties": {"clay": %s, "silt": %s, "sand": %s, "organic_carbon": %s, "texture": %s}, '
+        '"hydraulic_properties": {"ksat": %s, "ksat_unit": ' + json.dumps(KSAT_UNIT).replace('%', '%%') + '}, '
+        '"runoff": {"coefficient": %s, "category": ' + json.dumps(category).replace('%', '%%') +
+        ', "interpretation": ' + json.dumps(interpretation).replace('%', '%%') + '}}'
+    )
+
+def _compile_text_template(category, interpretation):
+    """
+    Precompile the plain-text report layout (as printed by
+    test_runoff_report.py) for one band
+    """
+    text_interpretation = f"{category} RUNOFF POTENTIAL: {interpretation}".replace('%', '%%')
+    return """
+=================================================
+           RUNOFF COEFFICIENT REPORT
+=================================================
+
+LOCATION INFORMATION:
+---------------------
+Latitude: %s
+Longitude: %s
+
+SOIL PROPERTIES:
+----------------
+Soil Texture: %s
+Clay Content: %s%%
+Silt Content: %s%%
+Sand Content: %s%%
+Organic Carbon: %s%%
+
+HYDRAULIC PROPERTIES:
+--------------------
+Saturated Hydraulic Conductivity (Ksat): %s μm/s
+
+RUNOFF ASSESSMENT:
+-----------------
+Runoff Coefficient: %s
+
+INTERPRETATION:
+--------------
+""" + text_interpretation + """
+
+=================================================
+"""
+
+JSON_TEMPLATES = tuple(_compile_json_template(*payload) for payload in BAND_PAYLOADS)
+TEXT_TEMPLATES = tuple(_compile_text_template(*payload) for payload in BAND_PAYLOADS)
+
+def render_json(data, latitude, longitude):
+    """
+    Render the generate_report JSON for one result as a str.
+    Output is byte-identical to json.dumps(generate_report(...)).
+    """
+    if "error" in data:
+        return json.dumps({"error": data["error"]})
+    runoff = data["runoff_coefficient"]
+    soil = data["soil_properties"]
+    return JSON_TEMPLATES[band_index(runoff)] % (
+        _json_number(latitude), _json_number(longitude),
+        _json_number(soil["clay"]), _json_number(soil["silt"]), _json_number(soil["sand"]),
+        _json_number(soil["organic_carbon"]), _json_texture(soil["texture"]),
+        _json_number(data["ksat"]), _json_number(runoff)
+    )
+
+def build_report(data, latitude, longitude):
+    """
+    Same structure as generate_report, reusing the interned band payloads
+    """
+    if "error" in data:
+        return {"error": data["error"]}
+    runoff = data["runoff_coefficient"]
+    category, interpretation = BAND_PAYLOADS[band_index(runoff)]
+    return {
+        "location": {"latitude": latitude, "longitude": longitude},
+        "soil_properties": data["soil_properties"],
+        "hydraulic_properties": {"ksat": data["ksat"], "ksat_unit": KSAT_UNIT},
+        "runoff": {"coefficient": runoff, "category": category, "interpretation": interpretation}
+    }
+
+def render_text(data, latitude, longitude):
+    """
+    Render the plain-text report for one result
+    """
+    if "error" in data:
+        return f"ERROR: {data['error']}"
+    runoff = data["runoff_coefficient"]
+    soil = data["soil_properties"]
+    return TEXT_TEMPLATES[band_index(runoff)] % (
+        latitude, longitude, soil["texture"], soil["clay"], soil["silt"], soil["sand"],
+        soil["organic_carbon"], data["ksat"], runoff
+    )
+
+class ReportWriter:
+    """
+    Writes reports straight to a buffered binary stream, one per line
+    (JSON) or back to back (text).
+
+    JSON is encoded with orjson when it is installed (compact, UTF-8),
+    otherwise with the precompiled templates (json.dumps layout).
+    """
+    def __init__(self, stream, fmt="json", encoder=None, buffer_size=1 << 20):
+        if not isinstance(stream, io.BufferedIOBase):
+            stream = io.BufferedWriter(stream, buffer_size)
+        self.stream = stream
+        self.fmt = fmt
+        self.encoder = encoder or ("orjson" if orjson is not None else "template")
+        if self.encoder == "orjson" and orjson is None:
+            raise ValueError("orjson is not installed")
+        self.count = 0
+
+    def write(self, data, latitude, longitude):
+        if self.fmt == "text":
+            payload = render_text(data, latitude, longitude).encode('utf-8')
+        elif self.encoder == "orjson":
+            payload = orjson.dumps(build_report(data, latitude, longitude), option=orjson.OPT_APPEND_NEWLINE)
+        else:
+            payload = (render_json(data, latitude, longitude) + "\n").encode('utf-8')
+        self.stream.write(payload)
+        self.count += 1
+
+    def flush(self):
+        self.stream.flush()
+
+def read_results(path):
+    """
+    Read JSON-lines results (predict_runoff_coefficient output plus
+    latitude / longitude) for bulk rendering
+    """
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                yield record, record.get("latitude"), record.get("longitude")
+
+def run_benchmark(n_reports):
+    """
+    Compare generate_report + json.dumps against the rendering layer
+    """
+    samples = []
+    for i in range(n_reports):
+        runoff = round(0.1 + (i % 800) / 1000.0, 3)
+        samples.append(({
+            "runoff_coefficient": runoff,
+            "ksat": round(1.0 / runoff, 3),
+            "soil_properties": {
+                "clay": round(20 + i % 30, 1), "silt": round(30 + i % 20, 1),
+                "sand": round(50 - i % 30 + i % 20, 1), "organic_carbon": 1.25, "texture": "LOAM"
+            }
+        }, round(8 + (i % 2000) / 100.0, 4), round(70 + (i % 1500) / 100.0, 4)))
+
+    results = {"reports": n_reports}
+
+    sink = io.BytesIO()
+    start = time.perf_counter()
+    for data, lat, lon in samples:
+        sink.write((json.dumps(generate_report(data, lat, lon)) + "\n").encode('utf-8'))
+    results["baseline_seconds"] = round(time.perf_counter() - start, 3)
+    baseline_output = sink.getvalue()
+
+    encoders = ["template"] + (["orjson"] if orjson is not None else [])
+    for encoder in encoders:
+        sink = io.BytesIO()
+        writer = ReportWriter(sink, encoder=encoder)
+        start = time.perf_counter()
+        for data, lat, lon in samples:
+            writer.write(data, lat, lon)
+        writer.flush()
+        results[f"{encoder}_seconds"] = round(time.perf_counter() - start, 3)
+        if encoder == "template":
+            results["template_identical"] = sink.getvalue() == baseline_output
+
+    sink = io.BytesIO()
+    writer = ReportWriter(sink, fmt="text")
+    start = time.perf_counter()
+    for data, lat, lon in samples:
+        writer.write(data, lat, lon)
+    writer.flush()
+    results["text_seconds"] = round(time.perf_counter() - start, 3)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk runoff report rendering")
+    parser.add_argument("results", nargs="?", help="JSON-lines file of runoff results with latitude/longitude")
+    parser.add_argument("--format", choices=["json", "text"], default="json")
+    parser.add_argument("--encoder", choices=["orjson", "template"], default=None,
+                        help="JSON encoder (default: orjson if installed)")
+    parser.add_argument("--output", default=None, help="Output file (default: stdout)")
+    parser.add_argument("--benchmark", type=int, default=None, metavar="REPORTS",
+                        help="Benchmark rendering this many reports")
+    args = parser.parse_args()
+
+    try:
+        if args.benchmark:
+            print(json.dumps(run_benchmark(args.benchmark)))
+            sys.exit(0)
+
+        if not args.results:
+            print(json.dumps({"error": "Expected a results file"}))
+            sys.exit(1)
+
+        stream = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        writer = ReportWriter(stream, args.format, args.encoder)
+        for data, latitude, longitude in read_results(args.results):
+            writer.write(data, latitude, longitude)
+        writer.flush()
+        if args.output:
+            stream.close()
+    except FileNotFoundError as e:
+        print(json.dumps({"error": f"File not found: {e.filename}"}))
+        sys.exit(1)
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import json
+import os
+import time
+import pickle
+import argparse
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.model_selection import cross_val_score
+from sklearn.metrics import mean_squared_error
+
+try:
+    import optuna
+except ImportError:
+    optuna = None
+
+from runoff_coefficient import (
+    FEATURE_COLUMNS, atomic_write, classify_soil_texture, load_model, model_path, metadata_path, canary_path
+)
+from runoff_simulation import KSAT_TO_MM_PER_HOUR
+
+# Get the directory of the current script
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Cached training set
+training_data_path = os.path.join(script_dir, 'training_data.csv')
+
+TARGET_COLUMN = "Ksat"
+
+# Share of rows held out as the canary batch
+CANARY_FRACTION = 0.2
+
+# A full re-tune needs at least this many rows. The cached training set
+# starts empty, so seed it with the original dataset first:
+#   retrain_runoff_model.py append full_data.xlsx
+MIN_TUNE_ROWS = 200
+
+# Accepted aliases for incoming field measurement rows
+COLUMN_ALIASES = {
+    "clay": "Clay",
+    "silt": "Silt",
+    "sand": "Sand",
+    "oc": "OC",
+    "organic_carbon": "OC",
+    "ksat": "Ksat",
+    "texture_encoded": "Texture Encoded"
+}
+
+def read_rows(path):
+    """
+    Read labelled rows from a CSV, Excel or JSON file and normalise them to
+    the training columns. Rows may carry Ksat in μm/s ("ksat") or a field
+    infiltration rate in mm/hr ("doubleRingTest", as sent by infiltrationModel.js).
+    """
+    if path.endswith('.json'):
+        with open(path, 'r') as f:
+            records = json.load(f)
+        if isinstance(records, dict):
+            records = [records]
+        frame = pd.json_normalize(records)
+        # Accept nested soil_properties / fieldTestResults objects
+        frame.columns = [column.split('.')[-1] for column in frame.columns]
+    elif path.endswith('.xlsx'):
+        frame = pd.read_excel(path)
+    else:
+        frame = pd.read_csv(path)
+
+    frame = frame.rename(columns={
+        column: COLUMN_ALIASES[column.lower()]
+        for column in frame.columns if column.lower() in COLUMN_ALIASES
+    })
+
+    if TARGET_COLUMN not in frame.columns and "doubleRingTest" in frame.columns:
+        rate = pd.to_numeric(frame["doubleRingTest"], errors='coerce')
+        frame[TARGET_COLUMN] = rate / KSAT_TO_MM_PER_HOUR
+
+    missing = [column for column in ["Clay", "Silt", "Sand", "OC", TARGET_COLUMN] if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing columns in {path}: {', '.join(missing)}")
+
+    for column in ["Clay", "Silt", "Sand", "OC", TARGET_COLUMN]:
+        frame[column] = pd.to_numeric(frame[column], errors='coerce')
+    frame = frame.dropna(subset=["Clay", "Silt", "Sand", "OC", TARGET_COLUMN])
+
+    if "Texture Encoded" not in frame.columns:
+        frame["Texture Encoded"] = [
+            classify_soil_texture(sand, silt, clay)[1]
+            for sand, silt, clay in zip(frame["Sand"], frame["Silt"], frame["Clay"])
+        ]
+
+    return frame.reindex(columns=FEATURE_COLUMNS + [TARGET_COLUMN]).reset_index(drop=True)
+
+def load_training_data():
+    """
+    Load the cached training set
+    """
+    if not os.path.exists(training_data_path):
+        return pd.DataFrame(columns=FEATURE_COLUMNS + [TARGET_COLUMN])
+    return pd.read_csv(training_data_path)
+
+def append_rows(rows):
+    """
+    Append new labelled rows to the cached training set.
+    Returns the full training set.
+    """
+    data = pd.concat([load_training_data(), rows], ignore_index=True)
+    atomic_write(training_data_path, data.to_csv(index=False).encode('utf-8'))
+    return data
+
+def load_metadata():
+    """
+    Load the model metadata, or defaults if no model has been trained yet
+    """
+    try:
+        with open(metadata_path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"version": 0, "tuned_rows": 0, "last_tuned_at": 0}
+
+def canary_mask(data):
+    """
+    Canary membership of every row, decided by a hash of the row's values.
+    A row stays on the same side of the split however many rows are
+    appended, so warm starts never train on earlier canary rows.
+    """
+    values = data[FEATURE_COLUMNS + [TARGET_COLUMN]].astype(float)
+    hashes = pd.util.hash_pandas_object(values, index=False).values
+    return (hashes % 1000) < CANARY_FRACTION * 1000
+
+def split_canary(data):
+    """
+    Split the training set into a training part and a held-out canary batch
+    """
+    X = data[FEATURE_COLUMNS].astype(float)
+    y = data[TARGET_COLUMN].astype(float)
+    canary = canary_mask(data)
+    if canary.all() or not canary.any():
+        raise ValueError("Not enough training rows for a canary batch")
+    return X[~canary], X[canary], y[~canary], y[canary]
+
+def suggest_params(trial):
+    """
+    Hyperparameter search space (same as untitled3.py)
+    """
+    return {
+        "max_depth": trial.suggest_int("max_depth", 3, 12),
+        "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.3, log=True),
+        "n_estimators": trial.suggest_int("n_estimators", 100, 1000),
+        "subsample": trial.suggest_float("subsample", 0.5, 1.0),
+        "colsample_bytree": trial.suggest_float("colsample_bytree", 0.5, 1.0),
+        "gamma": trial.suggest_float("gamma", 0, 5),
+        "reg_alpha": trial.suggest_float("reg_alpha", 0, 5),
+        "reg_lambda": trial.suggest_float("reg_lambda", 0, 5),
+        "min_child_weight": trial.suggest_int("min_child_weight", 1, 10),
+    }
+
+class RandomTrial:
+    """
+    Minimal stand-in for an optuna trial when optuna is not installed
+    """
+    def __init__(self, rng):
+        self.rng = rng
+
+    def suggest_int(self, name, low, high):
+        return int(self.rng.integers(low, high + 1))
+
+    def suggest_float(self, name, low, high, log=False):
+        if log:
+            return float(np.exp(self.rng.uniform(np.log(low), np.log(high))))
+        return float(self.rng.uniform(low, high))
+
+def tune_params(X_train, y_train, n_trials):
+    """
+    Search hyperparameters by 5-fold cross-validated RMSE
+    """
+    def cv_rmse(params):
+        model = xgb.XGBRegressor(**params, objective="reg:squarederror", random_state=42, n_jobs=-1)
+        score = cross_val_score(model, X_train, y_train, cv=5, scoring='neg_root_mean_squared_error')
+        return -score.mean()
+
+    if optuna is not None:
+        optuna.logging.set_verbosity(optuna.logging.WARNING)
+        study = optuna.create_study(direction="minimize")
+        study.optimize(lambda trial: cv_rmse(suggest_params(trial)), n_trials=n_trials)
+        return study.best_trial.params
+
+    # Plain random search over the same space
+    rng = np.random.default_rng(42)
+    best_params, best_rmse = None, float("inf")
+    for _ in range(n_trials):
+        params = suggest_params(RandomTrial(rng))
+        rmse = cv_rmse(params)
+        if rmse < best_rmse:
+            best_params, best_rmse = params, rmse
+    return best_params
+
+def train_full(data, n_trials):
+    """
+    Re-tune hyperparameters and train a new model from scratch
+    """
+    X_train, X_canary, y_train, y_canary = split_canary(data)
+    params = tune_params(X_train, y_train, n_trials)
+    model = xgb.XGBRegressor(**params, objective="reg:squarederror", random_state=42, n_jobs=-1)
+    model.fit(X_train, y_train)
+    return model, X_canary, y_canary
+
+def train_warm_start(current, data, rounds):
+    """
+    Continue boosting the current model for a number of extra rounds
+    on the updated training set
+    """
+    X_train, X_canary, y_train, y_canary = split_canary(data)
+    params = current.get_params()
+    params["n_estimators"] = rounds
+    model = xgb.XGBRegressor(**params)
+    model.fit(X_train, y_train, xgb_model=current.get_booster())
+    return model, X_canary, y_canary
+
+def publish_model(model, X_canary, y_canary, metadata):
+    """
+    Atomically swap the served model artifact, together with its metadata
+    and the canary batch resident workers validate new versions against
+    """
+    canary = X_canary.copy()
+    canary[TARGET_COLUMN] = y_canary
+    atomic_write(canary_path, canary.to_csv(index=False).encode('utf-8'))
+
+    rmse = float(np.sqrt(mean_squared_error(y_canary, model.predict(X_canary))))
+    metadata = dict(metadata, canary_rmse=rmse, updated_at=time.time())
+    metadata["version"] = metadata.get("version", 0) + 1
+
+    # The version is pickled with the model, so a worker labels whatever
+    # artifact it loaded correctly however the two writes interleave
+    atomic_write(metadata_path, json.dumps(metadata, indent=2).encode('utf-8'))
+    atomic_write(model_path, pickle.dumps({"model": model, "version": metadata["version"]}))
+    return metadata
+
+def retune_due(metadata, retune_rows, retune_days):
+    """
+    Check whether the retraining schedule calls for a full re-tune
+    """
+    if metadata["rows_since_tune"] >= retune_rows:
+        return True
+    return time.time() - metadata.get("last_tuned_at", 0) >= retune_days * 86400
+
+def update_model(data, args, force_tune=False):
+    """
+    Warm start from the served model, or re-tune when due.
+    Rows count towards the re-tune schedule whether they came in through
+    update or an earlier append.
+    """
+    metadata = load_metadata()
+    metadata.pop("retune_deferred", None)
+    # Metadata written before tuned_rows was recorded only has the counter
+    tuned_rows = metadata.get("tuned_rows", metadata.get("training_rows", 0) - metadata.get("rows_since_tune", 0))
+    metadata["tuned_rows"] = tuned_rows
+    metadata["training_rows"] = len(data)
+    metadata["rows_since_tune"] = max(0, len(data) - tuned_rows)
+
+    current = None
+    if not force_tune:
+        try:
+            current = load_model()
+        except Exception:
+            # No usable model yet, fall back to a full training run
+            current = None
+
+    tune = force_tune or current is None or retune_due(metadata, args.retune_rows, args.retune_days)
+    if tune and len(data) < args.min_tune_rows:
+        if force_tune or current is None:
+            raise ValueError(
+                f"Not enough training rows to tune ({len(data)} < {args.min_tune_rows}); "
+                "seed the training set with the original dataset first (append full_data.xlsx)"
+            )
+        # Keep the served model's hyperparameters until there is enough data
+        tune = False
+        metadata["retune_deferred"] = True
+
+    if tune:
+        model, X_canary, y_canary = train_full(data, args.trials)
+        metadata["mode"] = "tune"
+        metadata["tuned_rows"] = len(data)
+        metadata["rows_since_tune"] = 0
+        metadata["last_tuned_at"] = time.time()
+    else:
+        model, X_canary, y_canary = train_warm_start(current, data, args.rounds)
+        metadata["mode"] = "warm_start"
+
+    return publish_model(model, X_canary, y_canary, metadata)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental retraining of the Ksat model")
+    parser.add_argument("command", choices=["append", "update", "tune"],
+                        help="append: add rows only (seed with full_data.xlsx before the first update); "
+                             "update: add rows and retrain; tune: full re-tune")
+    parser.add_argument("rows", nargs="?", help="New labelled rows (.csv, .xlsx or .json)")
+    parser.add_argument("--rounds", type=int, default=50, help="Extra boosting rounds for a warm start")
+    parser.add_argument("--trials", type=int, default=100, help="Tuning trials for a full re-tune")
+    parser.add_argument("--retune-rows", type=int, default=200,
+                        help="Re-tune after this many new rows since the last tune")
+    parser.add_argument("--retune-days", type=float, default=30,
+                        help="Re-tune when the last tune is older than this many days")
+    parser.add_argument("--min-tune-rows", type=int, default=MIN_TUNE_ROWS,
+                        help="Never re-tune on fewer training rows than this")
+    args = parser.parse_args()
+
+    try:
+        new_rows = 0
+        if args.rows:
+            rows = read_rows(args.rows)
+            new_rows = len(rows)
+            data = append_rows(rows)
+        elif args.command != "tune":
+            print(json.dumps({"error": "Expected a file of new labelled rows"}))
+            sys.exit(1)
+        else:
+            data = load_training_data()
+
+        if args.command == "append":
+            print(json.dumps({"appended": new_rows, "training_rows": len(data)}))
+            sys.exit(0)
+
+        if len(data) < 10:
+            print(json.dumps({"error": "Not enough training rows"}))
+            sys.exit(1)
+
+        metadata = update_model(data, args, force_tune=args.command == "tune")
+        print(json.dumps({"appended": new_rows, **metadata}))
+    except FileNotFoundError as e:
+        print(json.dumps({"error": f"File not found: {e.filename}"}))
+        sys.exit(1)
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
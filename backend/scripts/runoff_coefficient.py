@@ -3,10 +3,18 @@
 
 import sys
 import json
-import pandas as pd
 import numpy as np
+try:
+    # Only the DataFrame prediction paths need pandas; lean_worker.py runs without it
+    import pandas as pd
+except ImportError:
+    pd = None
 import pickle
 import os
+import tempfile
+
+from soil_generator import synthetic_soil
+from model_metadata import metadata_path, read_version
 
 # Get the directory of the current script
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -14,35 +22,89 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 # Path to the saved model
 model_path = os.path.join(script_dir, 'runoff_model.pkl')
 
-# Load the pre-trained model
-try:
-    with open(model_path, 'rb') as f:
-        model = pickle.load(f)
-except FileNotFoundError:
-    print(json.dumps({"error": "Model file not found"}))
-    sys.exit(1)
+# Held-out canary batch written by retrain_runoff_model.py
+canary_path = os.path.join(script_dir, 'runoff_canary.csv')
+
+# Feature columns in the order the model was trained on (see untitled3.py)
+FEATURE_COLUMNS = ["Clay", "Silt", "Sand", "Texture Encoded", "OC"]
+
+# Define the custom texture class encoding mapping
+TEXTURE_ENCODING = {
+    "SANDY LOAM": 10,
+    "SANDY CLAY": 5,
+    "LOAM": 2,
+    "CLAY LOAM": 1,
+    "CLAY": 0,
+    "SILTY LOAM": 9,
+    "LOAMY SAND": 3,
+    "SILTY CLAY LOAM": 8,
+    "SILTY CLAY": 7,
+    "SAND": 4,
+    "SANDY CLAY LOAM": 11,
+    "Unknown": -1
+}
+
+# The pre-trained model, loaded on first use
+model = None
+
+def load_versioned_model(path=model_path):
+    """
+    Load a pickled model from disk together with the version it was
+    published as. retrain_runoff_model.py pickles both in one artifact, so
+    the version can never belong to a different model; a plain pickled
+    model has no version.
+    """
+    with open(path, 'rb') as f:
+        artifact = pickle.load(f)
+    if isinstance(artifact, dict) and "model" in artifact:
+        return artifact["model"], artifact.get("version")
+    return artifact, None
+
+def load_model(path=model_path):
+    """
+    Load a pickled model from disk
+    """
+    return load_versioned_model(path)[0]
+
+def atomic_write(path, payload):
+    """
+    Write bytes to a temporary file next to the target and rename it into
+    place, so readers only ever see the old or the new complete file
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def file_signature(path):
+    """
+    Identify a version of a file by inode, size and modification time
+    """
+    stat = os.stat(path)
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def get_model():
+    """
+    Return the pre-trained model, loading it on first use
+    """
+    global model
+    if model is None:
+        model = load_model()
+    return model
 
 def classify_soil_texture(sand, silt, clay):
     """
     Classify soil texture based on sand, silt, and clay percentages.
     Returns the texture name and encoded value.
     """
-    # Define the custom texture class encoding mapping
-    custom_texture_encoding = {
-        "SANDY LOAM": 10,
-        "SANDY CLAY": 5,
-        "LOAM": 2,
-        "CLAY LOAM": 1,
-        "CLAY": 0,
-        "SILTY LOAM": 9,
-        "LOAMY SAND": 3,
-        "SILTY CLAY LOAM": 8,
-        "SILTY CLAY": 7,
-        "SAND": 4,
-        "SANDY CLAY LOAM": 11,
-        "Unknown": -1
-    }
-    
     # Simple classification logic based on percentages
     if sand >= 85:
         texture = "SAND"
@@ -71,34 +133,121 @@ def classify_soil_texture(sand, silt, clay):
     else:
         texture = "Unknown"
     
-    return texture, custom_texture_encoding.get(texture, -1)
+    return texture, TEXTURE_ENCODING.get(texture, -1)
 
-def predict_runoff_coefficient(lat, lon):
+def classify_soil_texture_batch(sand, silt, clay):
+    """
+    Vectorised classify_soil_texture for arrays of percentages.
+    Returns only the encoded texture values.
+    """
+    sand = np.asarray(sand, dtype=np.float64)
+    silt = np.asarray(silt, dtype=np.float64)
+    clay = np.asarray(clay, dtype=np.float64)
+
+    # Same rules, in the same order, as classify_soil_texture
+    conditions = [
+        sand >= 85,
+        (sand >= 70) & (clay <= 15),
+        (sand >= 50) & (sand < 70) & (clay <= 20),
+        (clay >= 35) & (sand >= 45),
+        (clay >= 25) & (clay < 35) & (sand >= 45),
+        (clay >= 25) & (clay < 40) & (sand < 45) & (silt < 40),
+        clay >= 40,
+        silt >= 80,
+        (clay >= 40) & (silt >= 40),
+        (clay >= 25) & (clay < 40) & (silt >= 40),
+        (silt >= 50) & (silt < 80) & (clay < 25),
+        (sand < 50) & (clay < 25) & (silt < 50)
+    ]
+    choices = [4, 3, 10, 5, 11, 1, 0, 9, 7, 8, 9, 2]
+    return np.select(conditions, choices, default=-1)
+
+def generate_soil_properties(lat, lon):
+    """
+    Generate dummy soil properties (clay, silt, sand, organic carbon)
+    based on the coordinates.
+    """
+    # In a real implementation, you would fetch soil data from an API using lat/lon
+    # For this example, we'll generate dummy values keyed on the coordinates.
+    # The generator is stateless, so this is safe to call from any thread.
+    clay, silt, sand, oc = synthetic_soil(lat, lon)
+    return float(clay[0]), float(silt[0]), float(sand[0]), float(oc[0])
+
+def soil_feature_matrix(lats, lons):
+    """
+    Build the model feature matrix (FEATURE_COLUMNS order, float32)
+    for arrays of coordinates in one vectorised pass
+    """
+    return features_from_soil(*synthetic_soil(lats, lons))
+
+def features_from_soil(clay, silt, sand, oc):
+    """
+    Build the model feature matrix (FEATURE_COLUMNS order, float32)
+    from arrays of soil properties
+    """
+    clay = np.asarray(clay, dtype=np.float64)
+    silt = np.asarray(silt, dtype=np.float64)
+    sand = np.asarray(sand, dtype=np.float64)
+    features = np.empty((len(clay), len(FEATURE_COLUMNS)), dtype=np.float32)
+    features[:, 0] = clay
+    features[:, 1] = silt
+    features[:, 2] = sand
+    # Classify on the float64 values, as classify_soil_texture does
+    features[:, 3] = classify_soil_texture_batch(sand, silt, clay)
+    features[:, 4] = oc
+    return features
+
+def runoff_coefficient_from_ksat(ksat):
+    """
+    Calculate runoff coefficient (simplified formula).
+    Higher Ksat means better infiltration, so lower runoff coefficient.
+    This is a simplified inverse relationship; works on scalars and arrays.
+    """
+    runoff_coef = 1.0 / (1.0 + 0.1 * ksat)
+    return np.clip(runoff_coef, 0.1, 0.9)  # Clip to reasonable range
+
+def predict_ksat_batch(model, features):
+    """
+    Predict Ksat for a float32 feature matrix in FEATURE_COLUMNS order.
+    XGBoost models predict straight from the array without a DataFrame copy.
+    """
+    if hasattr(model, "get_booster"):
+        return model.get_booster().inplace_predict(features)
+    return np.asarray(model.predict(pd.DataFrame(features, columns=FEATURE_COLUMNS)))
+
+def prediction_record(soil, texture_name, ksat):
+    """
+    The result record of one prediction, as returned by predict_runoff_coefficient
+    """
+    clay_pct, silt_pct, sand_pct, oc_value = soil
+    ksat = float(ksat)
+    runoff_coef = runoff_coefficient_from_ksat(ksat)
+    return {
+        "runoff_coefficient": round(runoff_coef, 3),
+        "ksat": round(ksat, 3),
+        "soil_properties": {
+            "clay": round(clay_pct, 1),
+            "silt": round(silt_pct, 1),
+            "sand": round(sand_pct, 1),
+            "organic_carbon": round(oc_value, 2),
+            "texture": texture_name
+        }
+    }
+
+def predict_runoff_coefficient(lat, lon, model=None, soil=None):
     """
     Predict runoff coefficient based on latitude and longitude.
     This is a simplified version that would normally fetch soil data from an API.
     For this example, we'll use dummy values based on the coordinates.
+    A resident process can pass the model to use and already fetched soil
+    properties (clay, silt, sand, oc); otherwise the module's pre-trained
+    model and the dummy values are used.
     """
-    # In a real implementation, you would fetch soil data from an API using lat/lon
-    # For this example, we'll generate dummy values based on the coordinates
-    
     # Generate dummy soil properties based on coordinates
     # This is just for demonstration - in a real app, you'd fetch actual data
-    seed = int(abs(lat * 100) + abs(lon * 100))
-    np.random.seed(seed)
-    
-    # Generate soil properties (these would normally come from an API)
-    clay_pct = np.clip(np.random.normal(30, 10), 5, 60)
-    silt_pct = np.clip(np.random.normal(40, 10), 5, 70)
-    sand_pct = 100 - clay_pct - silt_pct
-    if sand_pct < 5:
-        # Adjust to ensure valid percentages
-        diff = 5 - sand_pct
-        silt_pct -= diff
-        sand_pct = 5
-    
-    # Organic carbon content
-    oc_value = np.clip(np.random.normal(1.5, 0.5), 0.2, 3.0)
+    if soil is None:
+        soil = generate_soil_properties(lat, lon)
+    clay_pct, silt_pct, sand_pct, oc_value = soil
     
     # Get texture classification
     texture_name, texture_encoded = classify_soil_texture(sand_pct, silt_pct, clay_pct)
@@ -113,29 +262,14 @@ def predict_runoff_coefficient(lat, lon):
     }
     
     # Create DataFrame for prediction
-    input_data = pd.DataFrame([soil_features])
+    input_data = pd.DataFrame([soil_features], columns=FEATURE_COLUMNS)
     
     # Make prediction
     try:
-        ksat = model.predict(input_data)[0]
-        
-        # Calculate runoff coefficient (simplified formula)
-        # Higher Ksat means better infiltration, so lower runoff coefficient
-        # This is a simplified inverse relationship
-        runoff_coef = 1.0 / (1.0 + 0.1 * ksat)
-        runoff_coef = np.clip(runoff_coef, 0.1, 0.9)  # Clip to reasonable range
-        
-        return {
-            "runoff_coefficient": round(runoff_coef, 3),
-            "ksat": round(ksat, 3),
-            "soil_properties": {
-                "clay": round(clay_pct, 1),
-                "silt": round(silt_pct, 1),
-                "sand": round(sand_pct, 1),
-                "organic_carbon": round(oc_value, 2),
-                "texture": texture_name
-            }
-        }
+        if model is None:
+            model = get_model()
+        ksat = float(model.predict(input_data)[0])
+        return prediction_record(soil, texture_name, ksat)
     except Exception as e:
         return {"error": str(e)}
 
@@ -149,11 +283,23 @@ if __name__ == "__main__":
         lat = float(sys.argv[1])
         lon = float(sys.argv[2])
         
-        # Get prediction
-        result = predict_runoff_coefficient(lat, lon)
+        # Use the result the assessment worker already computed, if any
+        from assessment_queue import lookup_result
+        precomputed = lookup_result(lat, lon, read_version(), soil_source="synthetic")
+        if precomputed is not None:
+            result = precomputed[0]
+        else:
+            # Load the pre-trained model
+            get_model()
+            
+            # Get prediction
+            result = predict_runoff_coefficient(lat, lon)
         
         # Output as JSON
         print(json.dumps(result))
+    except FileNotFoundError:
+        print(json.dumps({"error": "Model file not found"}))
+        sys.exit(1)
     except ValueError:
         print(json.dumps({"error": "Invalid latitude or longitude values"}))
         sys.exit(1)
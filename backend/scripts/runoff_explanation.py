@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import json
+import threading
+import argparse
+from collections import OrderedDict
+import numpy as np
+import xgboost as xgb
+
+from runoff_coefficient import (
+    FEATURE_COLUMNS, features_from_soil, get_model, runoff_coefficient_from_ksat, soil_feature_matrix
+)
+from soil_generator import coordinate_key
+
+def feature_contributions(model, features, approximate=False):
+    """
+    TreeSHAP contributions of each feature to the predicted Ksat, for a
+    whole batch in one call. Returns (contributions, base_values) where
+    contributions has one column per FEATURE_COLUMNS entry.
+    With approximate=True the per-tree path (Saabas) attribution is used
+    instead, which is several times faster on deep ensembles.
+    """
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    matrix = xgb.DMatrix(np.asarray(features, dtype=np.float32), feature_names=FEATURE_COLUMNS)
+    contributions = booster.predict(matrix, pred_contribs=True, approx_contribs=approximate)
+    # The last column is the bias (expected value) term
+    return contributions[:, :-1], contributions[:, -1]
+
+def describe(contributions, base_value, features):
+    """
+    Build one explanation record from a row of contributions
+    """
+    ksat = float(base_value + contributions.sum())
+    drivers = sorted(
+        (
+            {
+                "feature": name,
+                "value": round(float(value), 3),
+                "ksat_contribution": round(float(contribution), 4),
+                # Higher Ksat means lower runoff
+                "effect_on_runoff": (
+                    "decreases" if contribution > 0 else "increases" if contribution < 0 else "none"
+                )
+            }
+            for name, value, contribution in zip(FEATURE_COLUMNS, features, contributions)
+        ),
+        key=lambda driver: -abs(driver["ksat_contribution"])
+    )
+    return {
+        "ksat": round(ksat, 3),
+        "runoff_coefficient": round(float(runoff_coefficient_from_ksat(ksat)), 3),
+        "base_ksat": round(float(base_value), 3),
+        "drivers": drivers
+    }
+
+class RunoffExplainer:
+    """
+    Explains Ksat / runoff predictions per coordinate, with an LRU cache
+    keyed on the model version and the same quantised coordinate key the
+    soil properties are generated from, so a cached explanation always
+    describes the prediction for that exact point. Cache misses of a batch
+    are explained together in one pred_contribs call.
+    """
+    def __init__(self, max_entries=10000, approximate=False):
+        self.max_entries = max_entries
+        self.approximate = approximate
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def explain(self, model, version, lats, lons, soil=None):
+        """
+        Explain a batch of coordinates. `soil` optionally fetches
+        (clay, silt, sand, oc) for a coordinate; otherwise the synthetic
+        soil properties are used.
+        """
+        keys = [(coordinate_key(lat, lon), version) for lat, lon in zip(lats, lons)]
+        results = [None] * len(keys)
+        missing = []
+        with self.lock:
+            for position, key in enumerate(keys):
+                cached = self.cache.get(key)
+                if cached is None:
+                    missing.append(position)
+                else:
+                    self.cache.move_to_end(key)
+                    results[position] = cached
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            miss_lats = [lats[position] for position in missing]
+            miss_lons = [lons[position] for position in missing]
+            if soil is None:
+                features = soil_feature_matrix(miss_lats, miss_lons)
+            else:
+                features = features_from_soil(*zip(*[soil(lat, lon) for lat, lon in zip(miss_lats, miss_lons)]))
+            contributions, base_values = feature_contributions(model, features, self.approximate)
+
+            with self.lock:
+                for row, position in enumerate(missing):
+                    explanation = describe(contributions[row], base_values[row], features[row])
+                    results[position] = explanation
+                    self.cache[keys[position]] = explanation
+                while len(self.cache) > self.max_entries:
+                    self.cache.popitem(last=False)
+        return results
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.cache), "hits": self.hits, "misses": self.misses}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Explain which soil features drove Ksat / runoff predictions")
+    parser.add_argument("coordinates", nargs="+", type=float, metavar="LAT LON",
+                        help="Latitude / longitude pairs")
+    parser.add_argument("--approximate", action="store_true",
+                        help="Use the faster path attribution instead of exact TreeSHAP")
+    args = parser.parse_args()
+
+    if len(args.coordinates) % 2:
+        print(json.dumps({"error": "Expected latitude / longitude pairs"}))
+        sys.exit(1)
+
+    try:
+        lats, lons = args.coordinates[0::2], args.coordinates[1::2]
+        explanations = RunoffExplainer(approximate=args.approximate).explain(get_model(), None, lats, lons)
+        print(json.dumps([
+            {"latitude": lat, "longitude": lon, **explanation}
+            for lat, lon, explanation in zip(lats, lons, explanations)
+        ]))
+    except FileNotFoundError:
+        print(json.dumps({"error": "Model file not found"}))
+        sys.exit(1)
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
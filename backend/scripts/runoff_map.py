@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import json
+import argparse
+import numpy as np
+
+from runoff_coefficient import get_model, predict_ksat_batch, runoff_coefficient_from_ksat, soil_feature_matrix
+from report_rendering import BAND_LIMITS, BAND_PAYLOADS
+
+def runoff_categories(coefficients):
+    """
+    Vectorised get_runoff_category as band indices (0 = LOW ... 3 = VERY HIGH)
+    """
+    return np.searchsorted(BAND_LIMITS, coefficients, side='right')
+
+def model_evaluator(model=None):
+    """
+    Evaluate runoff coefficients for arrays of coordinates in one predict call
+    """
+    model = model or get_model()
+
+    def evaluate(lats, lons):
+        ksat = predict_ksat_batch(model, soil_feature_matrix(lats, lons))
+        return runoff_coefficient_from_ksat(np.asarray(ksat, dtype=np.float64))
+    return evaluate
+
+class RunoffMap:
+    """
+    Adaptive quadtree map of runoff coefficients over a bounding box.
+
+    Samples live on a lattice of (base * 2**max_depth + 1)**2 points. The
+    map starts from base x base coarse cells; a cell is split into four
+    when its corner samples fall in different runoff categories or their
+    coefficients differ by more than `threshold`. All new samples of a
+    refinement level are evaluated in a single call.
+    """
+    def __init__(self, bbox, evaluate, base=8, max_depth=4, threshold=0.05):
+        self.min_lat, self.min_lon, self.max_lat, self.max_lon = bbox
+        self.evaluate = evaluate
+        self.base = base
+        self.max_depth = max_depth
+        self.threshold = threshold
+        self.size = base * 2 ** max_depth
+        self.coefficients = np.full((self.size + 1, self.size + 1), np.nan)
+        self.evaluations = 0
+        self.leaves = np.empty((0, 3), dtype=np.int64)
+
+    def lattice_coordinates(self, i, j):
+        """
+        Latitude / longitude of lattice points (i along latitude, j along longitude)
+        """
+        lats = self.min_lat + (self.max_lat - self.min_lat) * i / self.size
+        lons = self.min_lon + (self.max_lon - self.min_lon) * j / self.size
+        return lats, lons
+
+    def _sample(self, i, j):
+        """
+        Evaluate the lattice points not sampled yet, in one batch
+        """
+        points = np.unique(np.column_stack([i, j]), axis=0)
+        missing = np.isnan(self.coefficients[points[:, 0], points[:, 1]])
+        points = points[missing]
+        if len(points):
+            lats, lons = self.lattice_coordinates(points[:, 0], points[:, 1])
+            self.coefficients[points[:, 0], points[:, 1]] = self.evaluate(lats, lons)
+            self.evaluations += len(points)
+
+    def build(self):
+        """
+        Refine level by level; returns the leaf cells as (i, j, size) rows
+        """
+        step = 2 ** self.max_depth
+        starts = np.arange(0, self.size, step)
+        i, j = np.meshgrid(starts, starts, indexing='ij')
+        cells = np.column_stack([i.ravel(), j.ravel(), np.full(i.size, step)])
+        leaves = []
+
+        for depth in range(self.max_depth + 1):
+            i, j, size = cells[:, 0], cells[:, 1], cells[:, 2]
+            corner_i = np.stack([i, i, i + size, i + size], axis=1)
+            corner_j = np.stack([j, j + size, j, j + size], axis=1)
+            self._sample(corner_i.ravel(), corner_j.ravel())
+
+            corners = self.coefficients[corner_i, corner_j]
+            categories = runoff_categories(corners)
+            split = (categories.min(axis=1) != categories.max(axis=1))
+            split |= (corners.max(axis=1) - corners.min(axis=1)) > self.threshold
+            if depth == self.max_depth:
+                split[:] = False
+
+            leaves.append(cells[~split])
+            parents = cells[split]
+            half = parents[:, 2] // 2
+            cells = np.concatenate([
+                np.column_stack([parents[:, 0] + di * half, parents[:, 1] + dj * half, half])
+                for di in (0, 1) for dj in (0, 1)
+            ]) if len(parents) else np.empty((0, 3), dtype=np.int64)
+            if not len(cells):
+                break
+
+        self.leaves = np.concatenate(leaves)
+        return self.leaves
+
+    def raster(self):
+        """
+        Coefficient raster on the full lattice. Sampled points keep their
+        values; the rest are bilinearly interpolated from their leaf's corners.
+        """
+        raster = self.coefficients.copy()
+        for size in np.unique(self.leaves[:, 2]):
+            cells = self.leaves[self.leaves[:, 2] == size]
+            offsets = np.arange(size + 1)
+            t = offsets / size
+            i0, j0 = cells[:, 0], cells[:, 1]
+            c00 = self.coefficients[i0, j0][:, None, None]
+            c01 = self.coefficients[i0, j0 + size][:, None, None]
+            c10 = self.coefficients[i0 + size, j0][:, None, None]
+            c11 = self.coefficients[i0 + size, j0 + size][:, None, None]
+            ti, tj = t[None, :, None], t[None, None, :]
+            values = (c00 * (1 - ti) * (1 - tj) + c01 * (1 - ti) * tj
+                      + c10 * ti * (1 - tj) + c11 * ti * tj)
+            rows = (i0[:, None, None] + offsets[None, :, None]).repeat(size + 1, axis=2)
+            cols = (j0[:, None, None] + offsets[None, None, :]).repeat(size + 1, axis=1)
+            unsampled = np.isnan(raster[rows, cols])
+            raster[rows[unsampled], cols[unsampled]] = values[unsampled]
+        return raster
+
+    def cells(self):
+        """
+        Leaf cells as JSON-serialisable records
+        """
+        records = []
+        for i, j, size in self.leaves.tolist():
+            lat_min, lon_min = self.lattice_coordinates(i, j)
+            lat_max, lon_max = self.lattice_coordinates(i + size, j + size)
+            corners = self.coefficients[[i, i, i + size, i + size], [j, j + size, j, j + size]]
+            coefficient = float(corners.mean())
+            records.append({
+                "lat_min": round(float(lat_min), 6), "lon_min": round(float(lon_min), 6),
+                "lat_max": round(float(lat_max), 6), "lon_max": round(float(lon_max), 6),
+                "depth": self.max_depth - (size.bit_length() - 1),
+                "coefficient": round(coefficient, 3),
+                "category": BAND_PAYLOADS[int(runoff_categories(coefficient))][0]
+            })
+        return records
+
+def compare_to_dense(runoff_map):
+    """
+    Evaluate the full lattice and compare categories with the adaptive map,
+    overall and on category boundaries
+    """
+    n = runoff_map.size + 1
+    i, j = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+    lats, lons = runoff_map.lattice_coordinates(i.ravel(), j.ravel())
+    dense = runoff_map.evaluate(lats, lons).reshape(n, n)
+    dense_categories = runoff_categories(dense)
+    adaptive_categories = runoff_categories(runoff_map.raster())
+
+    # Points with a differently categorised 4-neighbour lie on a boundary
+    boundary = np.zeros((n, n), dtype=bool)
+    vertical = dense_categories[1:, :] != dense_categories[:-1, :]
+    horizontal = dense_categories[:, 1:] != dense_categories[:, :-1]
+    boundary[1:, :] |= vertical
+    boundary[:-1, :] |= vertical
+    boundary[:, 1:] |= horizontal
+    boundary[:, :-1] |= horizontal
+
+    matches = dense_categories == adaptive_categories
+    return {
+        "dense_evaluations": int(n * n),
+        "category_accuracy": round(float(matches.mean()), 4),
+        "boundary_points": int(boundary.sum()),
+        "boundary_accuracy": round(float(matches[boundary].mean()), 4) if boundary.any() else 1.0
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Adaptive quadtree runoff map")
+    parser.add_argument("bbox", nargs=4, type=float, metavar=("MIN_LAT", "MIN_LON", "MAX_LAT", "MAX_LON"))
+    parser.add_argument("--base", type=int, default=8, help="Coarse cells per side")
+    parser.add_argument("--max-depth", type=int, default=4, help="Maximum refinement levels")
+    parser.add_argument("--threshold", type=float, default=0.05,
+                        help="Split cells whose corner coefficients differ by more than this")
+    parser.add_argument("--raster", default=None, help="Write the lattice raster to this .npz file")
+    parser.add_argument("--compare-dense", action="store_true",
+                        help="Also evaluate the dense grid and report accuracy")
+    args = parser.parse_args()
+
+    try:
+        runoff_map = RunoffMap(args.bbox, model_evaluator(), args.base, args.max_depth, args.threshold)
+        runoff_map.build()
+        output = {
+            "bbox": args.bbox,
+            "lattice_size": runoff_map.size + 1,
+            "evaluations": runoff_map.evaluations,
+            "cells": runoff_map.cells()
+        }
+        if args.compare_dense:
+            output["dense"] = compare_to_dense(runoff_map)
+        if args.raster:
+            raster = runoff_map.raster()
+            np.savez_compressed(args.raster, coefficient=raster.astype(np.float32),
+                                category=runoff_categories(raster).astype(np.uint8))
+        print(json.dumps(output))
+    except FileNotFoundError:
+        print(json.dumps({"error": "Model file not found"}))
+        sys.exit(1)
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
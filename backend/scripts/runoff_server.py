@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import json
+import signal
+import threading
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from runoff_coefficient import generate_soil_properties, predict_runoff_coefficient
+from model_store import ModelStore
+from site_index import SiteIndex, SiteResolver, model_tag
+from assessment_queue import lookup_result
+from singleflight import SingleFlight
+from runoff_explanation import RunoffExplainer
+from soilgrids import SOILGRIDS_URL, fetch_soil_properties
+from soil_generator import coordinate_key
+
+class RunoffService:
+    """
+    Serving path for runoff predictions.
+
+    Concurrent requests for the same rounded coordinate share one in-flight
+    soil fetch and one in-flight prediction (per model version) instead of
+    each starting their own.
+    """
+    def __init__(self, store, soil_source="synthetic", soilgrids_url=SOILGRIDS_URL,
+                 coalesce=True, approximate_explanations=False):
+        self.store = store
+        self.soil_source = soil_source
+        self.soilgrids_url = soilgrids_url
+        self.coalesce = coalesce
+        self.soil_flights = SingleFlight()
+        self.predict_flights = SingleFlight()
+        self.resolver = None
+        # Queue database of results precomputed by assessment_worker.py
+        self.results_db = None
+        self.explainer = RunoffExplainer(approximate=approximate_explanations)
+
+    def key(self, lat, lon):
+        """
+        Coalescing key: the quantised coordinate the synthetic soil is
+        generated from, so only requests for the same point share work
+        """
+        return coordinate_key(lat, lon)
+
+    def fetch_soil(self, lat, lon):
+        if self.soil_source == "soilgrids":
+            return fetch_soil_properties(lat, lon, self.soilgrids_url)
+        return generate_soil_properties(lat, lon)
+
+    def soil(self, lat, lon):
+        """
+        Soil properties for a coordinate, sharing duplicate in-flight fetches
+        """
+        if not self.coalesce:
+            return self.fetch_soil(lat, lon)
+        return self.soil_flights.do(self.key(lat, lon), self.fetch_soil, lat, lon)
+
+    def _predict(self, lat, lon, snapshot):
+        return predict_runoff_coefficient(lat, lon, model=snapshot.model, soil=self.soil(lat, lon))
+
+    def predict(self, lat, lon, snapshot=None):
+        """
+        Full fetch + predict for a coordinate. Returns a fresh dict, since
+        coalesced callers share the underlying result.
+        """
+        snapshot = snapshot or self.store.current
+        if not self.coalesce:
+            return self._predict(lat, lon, snapshot)
+        key = (self.key(lat, lon), snapshot.signature)
+        return dict(self.predict_flights.do(key, self._predict, lat, lon, snapshot))
+
+    def handle_request(self, request):
+        """
+        Answer one request. The model snapshot is taken once, so a reload that
+        happens meanwhile does not affect this request.
+        """
+        if request.get("command") == "status":
+            return self.status()
+        if request.get("command") == "explain":
+            return self.explain(request)
+
+        latitude = request.get("latitude")
+        longitude = request.get("longitude")
+        if latitude is None or longitude is None:
+            return {"error": "Latitude and longitude are required"}
+
+        snapshot = self.store.current
+        precomputed = None
+        if self.results_db is not None:
+            precomputed = lookup_result(float(latitude), float(longitude), snapshot.version,
+                                        self.results_db, self.soil_source)
+        if precomputed is not None:
+            result = dict(precomputed[0], source="precomputed")
+        elif self.resolver is not None:
+            result = self.resolver.resolve(float(latitude), float(longitude),
+                                           model_tag(snapshot.version, snapshot.signature), snapshot)
+        else:
+            result = self.predict(float(latitude), float(longitude), snapshot)
+        if "error" not in result:
+            result["model_version"] = snapshot.version
+        return result
+
+    def explain(self, request):
+        """
+        Feature contributions for one coordinate or a batch of "points"
+        ([[lat, lon], ...]), cached per rounded coordinate and model artifact
+        """
+        points = request.get("points")
+        if points is None:
+            points = [[request.get("latitude"), request.get("longitude")]]
+        if not points or any(lat is None or lon is None for lat, lon in points):
+            return {"error": "Latitude and longitude are required"}
+
+        lats = [float(lat) for lat, _ in points]
+        lons = [float(lon) for _, lon in points]
+        snapshot = self.store.current
+        explanations = self.explainer.explain(snapshot.model, snapshot.signature, lats, lons, soil=self.soil)
+        return {
+            "model_version": snapshot.version,
+            "explanations": [
+                {"latitude": lat, "longitude": lon, **explanation}
+                for lat, lon, explanation in zip(lats, lons, explanations)
+            ]
+        }
+
+    def status(self):
+        status = self.store.status()
+        status["coalescing"] = {
+            "soil": self.soil_flights.stats(),
+            "prediction": self.predict_flights.stats()
+        }
+        status["explanation_cache"] = self.explainer.stats()
+        if self.resolver is not None:
+            status["site_index"] = self.resolver.stats()
+        return status
+
+def respond(service, line):
+    """
+    Turn one request line into one response line
+    """
+    try:
+        request = json.loads(line)
+    except ValueError:
+        return json.dumps({"error": "Invalid request"})
+    try:
+        response = service.handle_request(request)
+    except Exception as e:
+        response = {"error": str(e)}
+    if isinstance(request, dict) and "id" in request:
+        response = {"id": request["id"], **response}
+    return json.dumps(response)
+
+def serve(service, stdin, stdout, threads=8):
+    """
+    Read one JSON request per line and write one JSON response per line.
+    Requests are handled concurrently, so responses can come back out of
+    order; requests may carry an "id" that is echoed back.
+    """
+    write_lock = threading.Lock()
+
+    def handle(line):
+        response = respond(service, line)
+        with write_lock:
+            stdout.write(response + "\n")
+            stdout.flush()
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for line in stdin:
+            line = line.strip()
+            if line:
+                pool.submit(handle, line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident runoff coefficient predictor (JSON lines on stdin/stdout)")
+    parser.add_argument("--poll-interval", type=float, default=2.0,
+                        help="Seconds between checks of the model artifact")
+    parser.add_argument("--site-index", default=None,
+                        help="Answer from nearby resolved sites using this persisted index file")
+    parser.add_argument("--reuse-radius", type=float, default=250.0, help="Site reuse radius in metres")
+    parser.add_argument("--validate-fraction", type=float, default=0.1,
+                        help="Fraction of reused site answers also predicted in full to measure their error")
+    parser.add_argument("--results-db", default=None,
+                        help="Answer from results precomputed by assessment_worker.py in this queue database")
+    parser.add_argument("--soil-source", choices=["synthetic", "soilgrids"], default="synthetic")
+    parser.add_argument("--soilgrids-url", default=SOILGRIDS_URL)
+    parser.add_argument("--threads", type=int, default=8, help="Requests handled concurrently")
+    parser.add_argument("--no-coalesce", action="store_true",
+                        help="Disable sharing of duplicate in-flight soil fetches and predictions")
+    parser.add_argument("--approximate-explanations", action="store_true",
+                        help="Explain with the faster path attribution instead of exact TreeSHAP")
+    args = parser.parse_args()
+
+    try:
+        store = ModelStore(poll_interval=args.poll_interval).start()
+    except FileNotFoundError:
+        print(json.dumps({"error": "Model file not found"}))
+        sys.exit(1)
+    except Exception as e:
+        print(json.dumps({"error": f"Failed to load model: {str(e)}"}))
+        sys.exit(1)
+
+    service = RunoffService(store, args.soil_source, args.soilgrids_url, coalesce=not args.no_coalesce,
+                            approximate_explanations=args.approximate_explanations)
+    if args.site_index:
+        service.resolver = SiteResolver(SiteIndex.load(args.site_index), predict=service.predict,
+                                        radius_m=args.reuse_radius, validate_fraction=args.validate_fraction)
+    if args.results_db:
+        service.results_db = args.results_db
+
+    def terminate(signum, frame):
+        # SIGTERM (Node's child.kill()) would otherwise end the process
+        # without the cleanup below, losing the sites resolved in this run
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, terminate)
+    try:
+        serve(service, sys.stdin, sys.stdout, args.threads)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.stop()
+        if service.resolver is not None:
+            service.resolver.index.save(args.site_index)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+from concurrent.futures import Future
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is still running wait on the same future and get its result (or its
+    exception) instead of starting their own call. Nothing is cached once
+    the call finishes.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.calls = 0
+        self.executed = 0
+        self.suppressed = 0
+
+    def do(self, key, fn, *args):
+        with self.lock:
+            self.calls += 1
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self.in_flight[key] = Future()
+                self.executed += 1
+            else:
+                self.suppressed += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+
+    def stats(self):
+        """
+        Call counters; suppressed calls are the duplicates that shared a flight
+        """
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "executed": self.executed,
+                "suppressed": self.suppressed,
+                "in_flight": len(self.in_flight)
+            }
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import io
+import json
+import os
+import threading
+import argparse
+from collections import deque
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+from runoff_coefficient import (
+    atomic_write, classify_soil_texture, load_versioned_model, model_path, predict_runoff_coefficient,
+    runoff_coefficient_from_ksat, script_dir
+)
+from model_store import file_signature
+from soil_generator import coordinate_uniform
+
+# Default location of the persisted index
+index_path = os.path.join(script_dir, 'site_index.npz')
+
+EARTH_RADIUS_M = 6371000.0
+
+# Numeric values stored for every resolved site, in column order
+VALUE_COLUMNS = ["clay", "silt", "sand", "organic_carbon", "ksat", "runoff_coefficient"]
+
+# Stream of the coordinate generator used to pick which reuses get validated
+VALIDATION_STREAM = 16
+
+def model_tag(version, signature):
+    """
+    Identify the model artifact a site's values were predicted with
+    """
+    return f"{version}:" + "-".join(str(part) for part in signature)
+
+def to_cartesian(lats, lons):
+    """
+    Project coordinates onto a sphere in metres. Straight-line distances
+    match great-circle distances to well under a metre at the radii used
+    here, and the projection works anywhere on the globe.
+    """
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return EARTH_RADIUS_M * np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+class SiteIndex:
+    """
+    Spatial index over already-resolved sites and their soil / runoff values.
+
+    Built sites live in a KD-tree; sites added since the last build are kept
+    in a small pending buffer that is searched by brute force and folded
+    into the tree every `rebuild_every` additions.
+
+    Every site records the model tag its values were predicted with;
+    lookups only return sites of the requested model.
+    """
+    def __init__(self, rebuild_every=256):
+        self.rebuild_every = rebuild_every
+        self.points = np.empty((0, 3))
+        self.values = np.empty((0, len(VALUE_COLUMNS)))
+        self.models = np.empty(0, dtype=str)
+        self.tree = None
+        self.pending_points = []
+        self.pending_values = []
+        self.pending_models = []
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.points) + len(self.pending_points)
+
+    def _rebuild(self):
+        if self.pending_points:
+            self.points = np.vstack([self.points, np.array(self.pending_points)])
+            self.values = np.vstack([self.values, np.array(self.pending_values)])
+            self.models = np.concatenate([self.models, np.array(self.pending_models)])
+            self.pending_points = []
+            self.pending_values = []
+            self.pending_models = []
+        self.tree = cKDTree(self.points) if cKDTree is not None and len(self.points) else None
+
+    def add(self, lat, lon, result, model=""):
+        """
+        Record a fully resolved site, predicted with the model tagged `model`
+        """
+        soil = result["soil_properties"]
+        row = [soil["clay"], soil["silt"], soil["sand"], soil["organic_carbon"],
+               result["ksat"], result["runoff_coefficient"]]
+        with self.lock:
+            self.pending_points.append(to_cartesian([lat], [lon])[0])
+            self.pending_values.append(row)
+            self.pending_models.append(model)
+            if len(self.pending_points) >= self.rebuild_every:
+                self._rebuild()
+
+    def nearest(self, lat, lon, k, radius_m, model=""):
+        """
+        Up to k sites of the given model within radius_m, as
+        (distances, values) sorted by distance
+        """
+        point = to_cartesian([lat], [lon])[0]
+        with self.lock:
+            distances, values = [], []
+            if self.tree is not None:
+                d, i = self.tree.query(point, k=k, distance_upper_bound=radius_m)
+                d, i = np.atleast_1d(d), np.atleast_1d(i)
+                found = np.isfinite(d)
+                d, i = d[found], i[found]
+                found = self.models[i] == model
+                distances.append(d[found])
+                values.append(self.values[i[found]])
+            elif len(self.points):
+                d = np.linalg.norm(self.points - point, axis=1)
+                found = (d <= radius_m) & (self.models == model)
+                distances.append(d[found])
+                values.append(self.values[found])
+            if self.pending_points:
+                d = np.linalg.norm(np.array(self.pending_points) - point, axis=1)
+                found = (d <= radius_m) & (np.array(self.pending_models) == model)
+                distances.append(d[found])
+                values.append(np.array(self.pending_values)[found])
+
+        if not distances:
+            return np.empty(0), np.empty((0, len(VALUE_COLUMNS)))
+        distances = np.concatenate(distances)
+        values = np.vstack(values)
+        order = np.argsort(distances)[:k]
+        return distances[order], values[order]
+
+    def evict(self, keep_model):
+        """
+        Drop every site not predicted with the model tagged `keep_model`;
+        returns how many were dropped
+        """
+        with self.lock:
+            self._rebuild()
+            keep = self.models == keep_model
+            evicted = int((~keep).sum())
+            if evicted:
+                self.points = self.points[keep]
+                self.values = self.values[keep]
+                self.models = self.models[keep]
+                self._rebuild()
+        return evicted
+
+    def save(self, path=index_path):
+        """
+        Persist the index (coordinates are stored projected)
+        """
+        with self.lock:
+            self._rebuild()
+            buffer = io.BytesIO()
+            np.savez(buffer, points=self.points, values=self.values, models=self.models)
+        atomic_write(path, buffer.getvalue())
+
+    @classmethod
+    def load(cls, path=index_path, rebuild_every=256):
+        """
+        Load a persisted index, or start an empty one
+        """
+        index = cls(rebuild_every)
+        if os.path.exists(path):
+            with np.load(path) as data:
+                index.points = data["points"]
+                index.values = data["values"]
+                # Indexes saved before sites were tagged match no model
+                index.models = data["models"] if "models" in data else np.full(len(index.points), "")
+            index._rebuild()
+        return index
+
+def interpolate(distances, values, power=2.0):
+    """
+    Inverse-distance weighted average of neighbouring site values.
+    A site closer than a metre is taken as is.
+    """
+    if distances[0] < 1.0:
+        return values[0]
+    weights = 1.0 / distances ** power
+    return weights @ values / weights.sum()
+
+class SiteResolver:
+    """
+    Answers a coordinate from nearby resolved sites when enough of them fall
+    within the radius, and falls back to the full fetch + predict path
+    otherwise. Full results are added to the index.
+
+    A deterministic fraction of reused answers is also resolved in full to
+    measure the approximation error.
+
+    Requests carry the tag of the model they are answered with. The first
+    request with a new tag evicts the sites of every other model; requests
+    still running on a replaced model neither reuse nor add sites.
+    """
+    def __init__(self, index, predict=predict_runoff_coefficient, radius_m=250.0,
+                 k=4, min_neighbors=3, validate_fraction=0.0):
+        self.index = index
+        self.predict = predict
+        self.radius_m = radius_m
+        self.k = k
+        self.min_neighbors = min_neighbors
+        self.validate_fraction = validate_fraction
+        self.requests = 0
+        self.reused = 0
+        # Errors of the most recent validated reuses
+        self.errors = deque(maxlen=10000)
+        self.model = None
+        self.retired_models = set()
+        self.evicted = 0
+        self.lock = threading.Lock()
+
+    def _current_model(self, model):
+        """
+        Switch to a new model tag, evicting the old model's sites. Returns
+        False for a model that has already been replaced.
+        """
+        with self.lock:
+            if model == self.model:
+                return True
+            if model in self.retired_models:
+                return False
+            if self.model is not None:
+                self.retired_models.add(self.model)
+            self.model = model
+        evicted = self.index.evict(model)
+        with self.lock:
+            self.evicted += evicted
+        return True
+
+    def approximate(self, lat, lon, model=""):
+        """
+        IDW estimate from nearby sites of the model, or None if there are too few
+        """
+        distances, values = self.index.nearest(lat, lon, self.k, self.radius_m, model)
+        if len(distances) < self.min_neighbors and not (len(distances) and distances[0] < 1.0):
+            return None
+
+        clay, silt, sand, oc, ksat, _ = interpolate(distances, values)
+        texture_name, _ = classify_soil_texture(sand, silt, clay)
+        return {
+            "runoff_coefficient": round(float(runoff_coefficient_from_ksat(ksat)), 3),
+            "ksat": round(float(ksat), 3),
+            "soil_properties": {
+                "clay": round(float(clay), 1),
+                "silt": round(float(silt), 1),
+                "sand": round(float(sand), 1),
+                "organic_carbon": round(float(oc), 2),
+                "texture": texture_name
+            },
+            "source": "nearby_sites",
+            "neighbors": int(len(distances))
+        }
+
+    def resolve(self, lat, lon, model="", *predict_args):
+        """
+        Resolve one coordinate with the model tagged `model`, reusing nearby
+        results of the same model when possible. Extra arguments are passed
+        on to predict.
+        """
+        with self.lock:
+            self.requests += 1
+
+        current = self._current_model(model)
+        result = self.approximate(lat, lon, model) if current else None
+        if result is not None:
+            with self.lock:
+                self.reused += 1
+            if self.validate_fraction and coordinate_uniform(lat, lon, VALIDATION_STREAM) < self.validate_fraction:
+                full = self.predict(lat, lon, *predict_args)
+                if "error" not in full:
+                    with self.lock:
+                        self.errors.append((
+                            abs(result["runoff_coefficient"] - full["runoff_coefficient"]),
+                            abs(result["ksat"] - full["ksat"])
+                        ))
+            return result
+
+        result = self.predict(lat, lon, *predict_args)
+        if "error" not in result:
+            if current:
+                self.index.add(lat, lon, result, model)
+            result["source"] = "model"
+        return result
+
+    def stats(self):
+        """
+        Reuse rate and approximation error of validated reuses
+        """
+        with self.lock:
+            errors = np.array(list(self.errors)).reshape(-1, 2)
+            stats = {
+                "requests": self.requests,
+                "reused": self.reused,
+                "reuse_rate": round(self.reused / self.requests, 4) if self.requests else 0.0,
+                "indexed_sites": len(self.index),
+                "evicted_sites": self.evicted,
+                "validated": len(errors)
+            }
+        if len(errors):
+            stats["runoff_coefficient_abs_error"] = {
+                "mean": round(float(errors[:, 0].mean()), 4),
+                "p95": round(float(np.percentile(errors[:, 0], 95)), 4),
+                "max": round(float(errors[:, 0].max()), 4)
+            }
+            stats["ksat_abs_error"] = {
+                "mean": round(float(errors[:, 1].mean()), 4),
+                "p95": round(float(np.percentile(errors[:, 1], 95)), 4),
+                "max": round(float(errors[:, 1].max()), 4)
+            }
+        return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resolve coordinates with nearest-neighbour reuse of resolved sites")
+    parser.add_argument("coordinates", help="CSV with latitude and longitude columns")
+    parser.add_argument("--index", default=index_path, help="Persisted index file")
+    parser.add_argument("--radius", type=float, default=250.0, help="Reuse radius in metres")
+    parser.add_argument("--k", type=int, default=4, help="Neighbours used for interpolation")
+    parser.add_argument("--min-neighbors", type=int, default=3)
+    parser.add_argument("--validate", type=float, default=0.1,
+                        help="Fraction of reused answers also resolved in full to measure error")
+    args = parser.parse_args()
+
+    try:
+        coordinates = pd.read_csv(args.coordinates)
+        index = SiteIndex.load(args.index)
+        resolver = SiteResolver(index, radius_m=args.radius, k=args.k,
+                                min_neighbors=args.min_neighbors, validate_fraction=args.validate)
+        signature = file_signature(model_path)
+        model, version = load_versioned_model(model_path)
+        tag = model_tag(version, signature)
+        for lat, lon in zip(coordinates["latitude"], coordinates["longitude"]):
+            resolver.resolve(float(lat), float(lon), tag, model)
+        index.save(args.index)
+        print(json.dumps(resolver.stats()))
+    except FileNotFoundError as e:
+        print(json.dumps({"error": f"File not found: {e.filename}"}))
+        sys.exit(1)
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
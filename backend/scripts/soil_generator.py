@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+# Stateless, counter-based random numbers keyed on the coordinate.
+#
+# Every value is a pure function of (latitude, longitude, stream), so the
+# same point always gets the same soil no matter which thread or process
+# asks, nothing touches the global np.random / random state, and whole
+# arrays of points are generated in one vectorised pass.
+
+# Coordinates are quantised to 1e-6 degrees (~0.1 m) before hashing
+COORDINATE_SCALE = 1_000_000
+
+_MASK64 = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_MIX1 = 0xBF58476D1CE4E5B9
+_MIX2 = 0x94D049BB133111EB
+_OFFSET = 1 << 31
+
+_U64_MIX1 = np.uint64(_MIX1)
+_U64_MIX2 = np.uint64(_MIX2)
+_SHIFT = {n: np.uint64(n) for n in (11, 27, 30, 31, 32)}
+
+# Streams 0-5: clay, silt and organic carbon each use a (u1, u2) pair
+N_SOIL_STREAMS = 6
+_STREAM_COUNTERS = np.array(
+    [((stream + 1) * _GOLDEN) & _MASK64 for stream in range(N_SOIL_STREAMS)], dtype=np.uint64
+)
+
+# Mean, standard deviation and clip range of clay, silt and organic carbon
+_SOIL_MEAN = np.array([30.0, 40.0, 1.5])
+_SOIL_STD = np.array([10.0, 10.0, 0.5])
+_SOIL_LOW = np.array([5.0, 5.0, 0.2])
+_SOIL_HIGH = np.array([60.0, 70.0, 3.0])
+
+def _mix64(x):
+    """
+    SplitMix64 finaliser on a uint64 array (wraps modulo 2**64)
+    """
+    x = x ^ (x >> _SHIFT[30])
+    x *= _U64_MIX1
+    x ^= x >> _SHIFT[27]
+    x *= _U64_MIX2
+    x ^= x >> _SHIFT[31]
+    return x
+
+def _mix64_int(x):
+    """
+    Pure-Python SplitMix64 finaliser, bit-identical to _mix64
+    """
+    x ^= x >> 30
+    x = (x * _MIX1) & _MASK64
+    x ^= x >> 27
+    x = (x * _MIX2) & _MASK64
+    return x ^ (x >> 31)
+
+def coordinate_keys(lats, lons):
+    """
+    Pack quantised coordinates into unique uint64 keys. Latitude and
+    longitude get 32 bits each, so distinct points never share a key.
+    """
+    lat_q = np.rint(np.asarray(lats, dtype=np.float64) * COORDINATE_SCALE).astype(np.int64) + _OFFSET
+    lon_q = np.rint(np.asarray(lons, dtype=np.float64) * COORDINATE_SCALE).astype(np.int64) + _OFFSET
+    return (lat_q.astype(np.uint64) << _SHIFT[32]) | lon_q.astype(np.uint64)
+
+def coordinate_key(lat, lon):
+    """
+    Scalar coordinate_keys as a Python int
+    """
+    lat_q = round(float(lat) * COORDINATE_SCALE) + _OFFSET
+    lon_q = round(float(lon) * COORDINATE_SCALE) + _OFFSET
+    return ((lat_q & 0xFFFFFFFF) << 32) | (lon_q & 0xFFFFFFFF)
+
+def stream_uniforms(keys, counters=_STREAM_COUNTERS):
+    """
+    Uniform [0, 1) values of shape (n_keys, n_streams); value (i, s) depends
+    only on keys[i] and stream s
+    """
+    bits = _mix64(_mix64(keys)[:, None] + counters)
+    return (bits >> _SHIFT[11]) * (1.0 / (1 << 53))
+
+def coordinate_uniform(lat, lon, stream):
+    """
+    Scalar uniform [0, 1) for one coordinate, without numpy.
+    Bit-identical to stream_uniforms for the same coordinate and stream.
+    """
+    key = _mix64_int(coordinate_key(lat, lon))
+    bits = _mix64_int((key + (stream + 1) * _GOLDEN) & _MASK64)
+    return (bits >> 11) * (1.0 / (1 << 53))
+
+def synthetic_soil(lats, lons):
+    """
+    Synthetic clay / silt / sand / organic carbon for arrays of coordinates,
+    with the same distributions predict_runoff_coefficient has always used.
+    Returns float64 arrays (clay, silt, sand, oc).
+    """
+    keys = coordinate_keys(np.atleast_1d(lats), np.atleast_1d(lons))
+    u = stream_uniforms(keys)
+
+    # Box-Muller: one normal per (u1, u2) stream pair, then scale and clip
+    z = np.sqrt(-2.0 * np.log1p(-u[:, 0::2])) * np.cos(2.0 * np.pi * u[:, 1::2])
+    values = np.clip(_SOIL_MEAN + _SOIL_STD * z, _SOIL_LOW, _SOIL_HIGH)
+    clay, silt, oc = values[:, 0], values[:, 1], values[:, 2]
+
+    sand = 100 - clay - silt
+    # Adjust to ensure valid percentages
+    low_sand = sand < 5
+    silt = np.where(low_sand, silt - (5 - sand), silt)
+    sand = np.where(low_sand, 5.0, sand)
+    return clay, silt, sand, oc
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import json
+import urllib.parse
+import urllib.request
+
+# SoilGrids REST API endpoint
+SOILGRIDS_URL = "https://rest.isric.org"
+QUERY_PATH = "/soilgrids/v2.0/properties/query"
+
+# Properties fetched for the model, all from the top layer
+PROPERTIES = ["sand", "silt", "clay", "ocd"]
+DEPTH = "0-5cm"
+
+class SoilGridsError(Exception):
+    """
+    Raised when SoilGrids cannot be reached or returns unusable data
+    """
+
+def convert_to_percent(value):
+    """Convert SoilGrids sand/silt/clay (0-1000) to %"""
+    return value / 10.0
+
+def convert_ocd(ocd_value):
+    """Simplified OCD to OC conversion used when the model was built (see untitled3.py)"""
+    return ocd_value * 0.001
+
+def query_url(lat, lon, base_url=SOILGRIDS_URL):
+    """
+    Build one query for all properties at a point
+    """
+    params = [("lat", lat), ("lon", lon), ("depth", DEPTH), ("value", "mean")]
+    params += [("property", prop) for prop in PROPERTIES]
+    return base_url.rstrip('/') + QUERY_PATH + "?" + urllib.parse.urlencode(params)
+
+def parse_response(data):
+    """
+    Extract (clay, silt, sand, oc) from a SoilGrids query response
+    """
+    values = {}
+    try:
+        for layer in data["properties"]["layers"]:
+            values[layer["name"]] = layer["depths"][0]["values"]["mean"]
+    except (KeyError, IndexError, TypeError):
+        raise SoilGridsError(f"Unexpected SoilGrids response: {str(data)[:200]}")
+
+    missing = [prop for prop in PROPERTIES if values.get(prop) is None]
+    if missing:
+        raise SoilGridsError(f"No SoilGrids data for {', '.join(missing)}")
+
+    return (
+        convert_to_percent(values["clay"]),
+        convert_to_percent(values["silt"]),
+        convert_to_percent(values["sand"]),
+        convert_ocd(values["ocd"])
+    )
+
+def fetch_soil_properties(lat, lon, base_url=SOILGRIDS_URL, timeout=10.0):
+    """
+    Fetch soil properties for a point from SoilGrids.
+    Returns (clay, silt, sand, oc) in the units the model expects.
+    """
+    try:
+        with urllib.request.urlopen(query_url(lat, lon, base_url), timeout=timeout) as response:
+            data = json.loads(response.read().decode('utf-8'))
+    except (OSError, ValueError) as e:
+        raise SoilGridsError(f"SoilGrids request failed: {e}")
+    return parse_response(data)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(json.dumps({"error": "Expected 2 arguments: latitude and longitude"}))
+        sys.exit(1)
+
+    try:
+        clay, silt, sand, oc = fetch_soil_properties(float(sys.argv[1]), float(sys.argv[2]))
+        print(json.dumps({"clay": clay, "silt": silt, "sand": sand, "organic_carbon": oc}))
+    except ValueError:
+        print(json.dumps({"error": "Invalid latitude or longitude values"}))
+        sys.exit(1)
+    except SoilGridsError as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import sqlite3
+import tempfile
+import unittest
+import unittest.mock
+
+from assessment_queue import RESULTS_DB_ENV, AssessmentQueue, lookup_result
+
+class AssessmentQueueTest(unittest.TestCase):
+    """
+    Retry, lease and dead-letter behaviour of the assessment queue
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'queue.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def queue(self, **options):
+        options.setdefault("max_attempts", 3)
+        options.setdefault("retry_delay", 0.0)
+        return AssessmentQueue(self.path, **options)
+
+    def status(self, queue, job_id):
+        with queue.connect() as conn:
+            row = conn.execute("SELECT status, attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row["status"], row["attempts"]
+
+    def test_failed_job_is_retried_then_dead_lettered(self):
+        queue = self.queue()
+        job_id, = queue.enqueue([(19.07, 72.87)])
+        for attempt in range(1, 4):
+            jobs = queue.claim(10)
+            self.assertEqual([job["id"] for job in jobs], [job_id])
+            self.assertEqual(jobs[0]["attempts"], attempt)
+            queue.fail(jobs, RuntimeError("boom"))
+        self.assertEqual(self.status(queue, job_id), ("dead", 3))
+        self.assertEqual(queue.claim(10), [])
+        self.assertEqual(queue.dead_letters()[0]["last_error"], "boom")
+
+    def test_retry_waits_for_backoff(self):
+        queue = self.queue(retry_delay=60.0)
+        queue.enqueue([(19.07, 72.87)])
+        queue.fail(queue.claim(10), RuntimeError("boom"))
+        self.assertEqual(queue.claim(10), [])
+        self.assertEqual(queue.metrics()["depth"]["queued"], 1)
+
+    def test_running_job_is_not_reclaimed_within_its_lease(self):
+        queue = self.queue(lease_seconds=300.0)
+        queue.enqueue([(19.07, 72.87)])
+        self.assertEqual(len(queue.claim(10)), 1)
+        self.assertEqual(queue.claim(10), [])
+
+    def test_expired_lease_is_reclaimed_then_dead_lettered(self):
+        queue = self.queue(lease_seconds=0.0)
+        job_id, = queue.enqueue([(19.07, 72.87)])
+        claims = 0
+        for _ in range(8):
+            time.sleep(0.01)
+            claims += len(queue.claim(10))
+        self.assertEqual(claims, 3)
+        status, attempts = self.status(queue, job_id)
+        self.assertEqual((status, attempts), ("dead", 3))
+        self.assertIn("Lease expired", queue.dead_letters()[0]["last_error"])
+
+    def test_requeue_dead_gives_fresh_attempts(self):
+        queue = self.queue(max_attempts=1)
+        job_id, = queue.enqueue([(19.07, 72.87)])
+        queue.fail(queue.claim(10), RuntimeError("boom"))
+        self.assertEqual(queue.requeue_dead(), 1)
+        self.assertEqual(self.status(queue, job_id), ("queued", 0))
+
+    def test_results_are_keyed_on_the_exact_coordinate_and_version(self):
+        queue = self.queue()
+        queue.enqueue([(19.0712345, 72.8712345)])
+        jobs = queue.claim(10)
+        queue.complete(jobs, [{"runoff_coefficient": 0.5}], ['{"report": 1}'], model_version=4)
+        self.assertEqual(self.status(queue, jobs[0]["id"]), ("done", 1))
+        self.assertEqual(lookup_result(19.0712345, 72.8712345, 4, self.path),
+                         ({"runoff_coefficient": 0.5}, '{"report": 1}'))
+        self.assertIsNone(lookup_result(19.07123, 72.87123, 4, self.path))
+        self.assertIsNone(lookup_result(19.0712345, 72.8712345, 5, self.path))
+
+    def test_results_are_only_served_for_the_same_soil_source(self):
+        queue = self.queue()
+        queue.enqueue([(19.07, 72.87)])
+        queue.complete(queue.claim(10), [{"runoff_coefficient": 0.5}], ['{}'], 4, soil_source="soilgrids")
+        self.assertIsNone(lookup_result(19.07, 72.87, 4, self.path))
+        self.assertIsNotNone(lookup_result(19.07, 72.87, 4, self.path, "soilgrids"))
+
+    def test_results_stored_without_a_soil_source_are_not_served(self):
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("CREATE TABLE results (latitude REAL NOT NULL, longitude REAL NOT NULL, "
+                         "model_version INTEGER, result TEXT NOT NULL, report TEXT NOT NULL, "
+                         "computed_at REAL NOT NULL, PRIMARY KEY (latitude, longitude))")
+            conn.execute("INSERT INTO results VALUES (19.07, 72.87, 4, '{}', '{}', 0)")
+        conn.close()
+        self.queue()
+        self.assertIsNone(lookup_result(19.07, 72.87, 4, self.path))
+
+    def test_results_db_environment_variable_selects_or_disables_the_lookup(self):
+        queue = self.queue()
+        queue.enqueue([(19.07, 72.87)])
+        queue.complete(queue.claim(10), [{"runoff_coefficient": 0.5}], ['{}'], 4)
+        with unittest.mock.patch.dict(os.environ, {RESULTS_DB_ENV: self.path}):
+            self.assertIsNotNone(lookup_result(19.07, 72.87, 4))
+        with unittest.mock.patch.dict(os.environ, {RESULTS_DB_ENV: ""}):
+            self.assertIsNone(lookup_result(19.07, 72.87, 4))
+
+    def test_lookup_does_not_create_a_database(self):
+        self.assertIsNone(lookup_result(19.07, 72.87, None, self.path))
+        self.assertFalse(os.path.exists(self.path))
+
+if __name__ == "__main__":
+    unittest.main()